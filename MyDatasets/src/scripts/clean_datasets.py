@@ -10,148 +10,125 @@ code blocks based on preprocessor directives and comments.
 import re
 import os
 import sys
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+# precompiled patterns, shared by every file processed
+_RE_BLOCK_COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+_RE_LINE_COMMENT = re.compile(r'//.*?$', re.MULTILINE)
+# #ifndef/#ifdef/#endif at the start of a line (leading whitespace allowed);
+# group 2 is the condition name, None for directives without one
+_RE_DIRECTIVE = re.compile(r'^[^\S\n]*#(ifndef|ifdef|endif)(?:[^\S\n]+(\w+))?',
+                           re.MULTILINE)
+
+# per output directory record of the inputs already processed, so re-runs
+# only touch files whose input changed
+MANIFEST_NAME = '.clean_manifest.json'
 
 def remove_comments(code):
     """remove C/C++ comments from code"""
     # Remove multi-line comments /* */
-    code = re.sub(r'/\*.*?\*/', '', code, flags=re.DOTALL)
+    code = _RE_BLOCK_COMMENT.sub('', code)
     # Remove single-line comments //
-    code = re.sub(r'//.*?$', '', code, flags=re.MULTILINE)
+    code = _RE_LINE_COMMENT.sub('', code)
     return code
 
-def parse_preprocessor_blocks(lines):
+def parse_preprocessor_blocks(content):
     """
     Parse preprocessor directives and build a nested structure.
-    Return a list of blocks, each containing:
-    - type: 'code', 'ifndef', 'ifdef'
-    - condition: for 'ifndef'/'ifdef' blocks
-    - content: nested list of lines/blocks
-    - start_line, end_line: line numbers in the original file
+    Return a list where each item is either:
+    - a str: a common code line
+    - a tuple (type, condition, content): an 'ifndef'/'ifdef' block whose
+      content is a nested list of lines/blocks
+    Directive lines are located by one regex scan over the whole text; the
+    code lines between two directives are copied over as a single slice.
     """
+    lines = content.split('\n')
     blocks = []
-    i = 0
-    
-    while i < len(lines):
-        line = lines[i].strip()
-        
-        # detect #ifndef
-        ifndef_match = re.match(r'#ifndef\s+(\w+)', line)
-        if ifndef_match:
-            condition = ifndef_match.group(1)
-            block_lines, end_idx = extract_block(lines, i)
-            blocks.append({
-                'type': 'ifndef',
-                'condition': condition,
-                'content': parse_preprocessor_blocks(block_lines),
-                'start_line': i,
-                'end_line': end_idx
-            })
-            i = end_idx + 1
-            continue
-        
-        # detect #ifdef
-        ifdef_match = re.match(r'#ifdef\s+(\w+)', line)
-        if ifdef_match:
-            condition = ifdef_match.group(1)
-            block_lines, end_idx = extract_block(lines, i)
-            blocks.append({
-                'type': 'ifdef',
-                'condition': condition,
-                'content': parse_preprocessor_blocks(block_lines),
-                'start_line': i,
-                'end_line': end_idx
-            })
-            i = end_idx + 1
-            continue
-
-        # common code line
-        blocks.append({
-            'type': 'code',
-            'content': lines[i],
-            'start_line': i,
-            'end_line': i
-        })
-        i += 1
-    
-    return blocks
+    # each frame is (is_block, content list); is_block is False for directives
+    # that only count towards #endif nesting (e.g. '#ifdef' without a name)
+    stack = [(False, blocks)]
+    next_line = 0   # first line not yet copied into the tree
+    line_idx = 0    # line index of scan_pos
+    scan_pos = 0
 
-def extract_block(lines, start_idx):
-    """
-    Extract all lines from start_idx to the matching #endif (excluding #ifndef/#ifdef and #endif).
-    Return the lines within the block and the index of #endif.
-    """
-    depth = 0
-    i = start_idx
-    
-    while i < len(lines):
-        line = lines[i].strip()
-        
-        if re.match(r'#ifndef|#ifdef', line):
-            depth += 1
-        elif re.match(r'#endif', line):
-            depth -= 1
-            if depth == 0:
-                # Found matching #endif
-                return lines[start_idx + 1:i], i
-        
-        i += 1
-
-    # If no matching #endif is found, return all remaining lines
-    return lines[start_idx + 1:], len(lines) - 1
+    for match in _RE_DIRECTIVE.finditer(content):
+        start = match.start()
+        line_idx += content.count('\n', scan_pos, start)
+        scan_pos = start
+
+        # common code lines up to (not including) the directive
+        stack[-1][1].extend(lines[next_line:line_idx])
+        # by default the directive line itself is kept as code
+        next_line = line_idx
+
+        directive, condition = match.groups()
+        if directive == 'endif':
+            if len(stack) > 1 and stack.pop()[0]:
+                # found matching #endif
+                next_line = line_idx + 1
+        elif condition is not None:
+            block_content = []
+            stack[-1][1].append((directive, condition, block_content))
+            stack.append((True, block_content))
+            next_line = line_idx + 1
+        else:
+            # unnamed directive: keep as code, but its #endif must not
+            # close the enclosing block
+            stack.append((False, stack[-1][1]))
+
+    # if no matching #endif is found, the block runs to the end of the file
+    stack[-1][1].extend(lines[next_line:])
+    return blocks
 
 def filter_blocks(blocks, dataset_type):
     """
-    Filter blocks based on dataset type
+    Filter blocks based on dataset type and return the resulting text
     dataset_type: 'good' or 'bad'
+    Blocks are walked iteratively and lines are emitted straight into the
+    output, collapsing runs of 3+ newlines into 2 on the way.
     """
-    result = []
-    
-    for block in blocks:
-        if block['type'] == 'code':
-            result.append(block['content'])
-        
-        elif block['type'] == 'ifndef':
-            condition = block['condition']
-            
-            if dataset_type == 'bad':
-                # bad dataset: remove OMITGOOD blocks, keep OMITBAD block content
-                if condition == 'OMITGOOD':
-                    continue  # skip entire block
-                elif condition == 'OMITBAD':
-                    # keep content but omit #ifndef and #endif
-                    result.extend(filter_blocks(block['content'], dataset_type))
-                elif condition in ['_WIN32', '_WIN64']:
-                    # remove platform-specific condition compilation
-                    continue
+    # bad dataset: remove OMITGOOD blocks, keep OMITBAD block content
+    # good dataset: remove OMITBAD blocks, keep OMITGOOD block content
+    omitted = 'OMITGOOD' if dataset_type == 'bad' else 'OMITBAD'
+
+    out = []
+    append = out.append
+    newline_run = 0  # newlines emitted since the last non-empty line
+    first = True
+    stack = [iter(blocks)]
+
+    while stack:
+        for block in stack[-1]:
+            if isinstance(block, str):
+                if first:
+                    first = False
                 else:
-                    # other conditions, keep but omit the markers
-                    result.extend(filter_blocks(block['content'], dataset_type))
-            
-            elif dataset_type == 'good':
-                # good dataset: remove OMITBAD blocks, keep OMITGOOD block content
-                if condition == 'OMITBAD':
+                    if newline_run < 2:
+                        append('\n')
+                    newline_run += 1
+                if block:
+                    append(block)
+                    newline_run = 0
+                continue
+
+            block_type, condition, content = block
+
+            if block_type == 'ifndef':
+                if condition == omitted:
                     continue  # skip entire block
-                elif condition == 'OMITGOOD':
-                    # keep content but omit #ifndef and #endif
-                    result.extend(filter_blocks(block['content'], dataset_type))
-                elif condition in ['_WIN32', '_WIN64']:
+                if condition in ('_WIN32', '_WIN64'):
                     # remove platform-specific condition compilation
                     continue
-                else:
-                    # other conditions, keep but omit the markers
-                    result.extend(filter_blocks(block['content'], dataset_type))
-        
-        elif block['type'] == 'ifdef':
-            condition = block['condition']
-            
-            # For #ifdef INCLUDEMAIN, need to recursively process internal OMITGOOD/OMITBAD
-            if condition == 'INCLUDEMAIN':
-                result.extend(filter_blocks(block['content'], dataset_type))
-            else:
-                # Other #ifdef blocks remove markers but keep content
-                result.extend(filter_blocks(block['content'], dataset_type))
-    
-    return result
+
+            # other blocks keep content but omit the markers; this includes
+            # #ifdef INCLUDEMAIN, whose nested OMITGOOD/OMITBAD are filtered too
+            stack.append(iter(content))
+            break
+        else:
+            stack.pop()
+
+    return ''.join(out)
 
 def process_file(input_path, output_path, dataset_type):
     """
@@ -164,48 +141,91 @@ def process_file(input_path, output_path, dataset_type):
     # step 1: remove comments
     content = remove_comments(content)
 
-    # step 2: split into lines
-    lines = content.split('\n')
-
-    # step 3: parse preprocessor blocks
-    blocks = parse_preprocessor_blocks(lines)
+    # step 2: parse preprocessor blocks
+    blocks = parse_preprocessor_blocks(content)
     
-    # step 4: filter blocks based on dataset type
-    filtered_lines = filter_blocks(blocks, dataset_type)
-    
-    # step 5: join lines back
-    result = '\n'.join(filtered_lines)
-
-    # clean up excessive blank lines (keep at most 2 consecutive blank lines)
-    result = re.sub(r'\n{3,}', '\n\n', result)
+    # step 3: filter blocks based on dataset type, keeping at most 2
+    # consecutive newlines
+    result = filter_blocks(blocks, dataset_type)
 
     # write to output file
     with open(output_path, 'w', encoding='utf-8') as f:
         f.write(result)
 
+def _process_one(task):
+    """
+    Worker wrapper around process_file, run in a separate process
+    Return the relative path and the error message (None on success)
+    """
+    input_path, output_path, dataset_type, rel_path = task
+    try:
+        process_file(input_path, output_path, dataset_type)
+    except Exception as e:
+        return rel_path, str(e)
+    return rel_path, None
+
+def load_manifest(manifest_path):
+    """
+    Load the {rel_path: [mtime_ns, size, dataset_type]} record written by
+    a previous run; an empty dict if there is none
+    """
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
 def process_directory(input_dir, output_dir, dataset_type):
     """
     Process an entire directory of files
     dataset_type: 'good' or 'bad'
+    Files are independent, so they are processed in parallel on all CPUs.
+    Files whose input is unchanged since the last run (same mtime, size and
+    dataset type, output still present) are skipped.
     """
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
+
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    old_manifest = load_manifest(manifest_path)
+    manifest = {}
+    stamps = {}
+    skipped = 0
     
+    # collect tasks first; output directories are created here, serially
+    tasks = []
     for root, dirs, files in os.walk(input_dir):
         for file in files:
             if file.endswith(('.c', '.cpp', '.h', '.hpp')):
                 input_path = os.path.join(root, file)
                 rel_path = os.path.relpath(input_path, input_dir)
                 output_path = os.path.join(output_dir, rel_path)
+
+                st = os.stat(input_path)
+                stamp = [st.st_mtime_ns, st.st_size, dataset_type]
+                if old_manifest.get(rel_path) == stamp and os.path.exists(output_path):
+                    manifest[rel_path] = stamp
+                    skipped += 1
+                    continue
                 
                 # create output directory if not exists
                 os.makedirs(os.path.dirname(output_path), exist_ok=True)
-                
-                print(f"Processing: {rel_path}")
-                try:
-                    process_file(input_path, output_path, dataset_type)
-                except Exception as e:
-                    print(f"Error processing {rel_path}: {e}")
+                tasks.append((input_path, output_path, dataset_type, rel_path))
+                stamps[rel_path] = stamp
+
+    if skipped:
+        print(f"Skipping {skipped} unchanged files")
+
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for rel_path, error in executor.map(_process_one, tasks, chunksize=16):
+            print(f"Processing: {rel_path}")
+            if error is not None:
+                print(f"Error processing {rel_path}: {error}")
+            else:
+                manifest[rel_path] = stamps[rel_path]
+
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
 
 if __name__ == "__main__":
     if len(sys.argv) != 4:
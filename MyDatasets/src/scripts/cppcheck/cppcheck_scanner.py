@@ -8,17 +8,33 @@ import subprocess
 import os
 import sys
 import json
+import threading
+from collections import Counter, defaultdict
 from datetime import datetime
 
-def run_cppcheck(input_dir, output_dir, report_format='html'):
+# lxml (libxml2) parses large reports noticeably faster; fall back to the
+# standard library parser when it is not installed
+try:
+    from lxml import etree as ET
+    HAVE_LXML = True
+except ImportError:
+    import xml.etree.ElementTree as ET
+    HAVE_LXML = False
+
+def run_cppcheck(input_dir, output_dir, report_format='html', force=True):
     """
     Run cppcheck on the specified directory.
     report_format: 'html', 'xml', and 'text'
+    force: check all preprocessor configurations (multiplies the work per file)
     """
     
     # create output directory if it doesn't exist
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
+
+    # analysis cache kept across runs, so unchanged files are not re-checked
+    build_dir = os.path.join(output_dir, 'cppcheck-build')
+    os.makedirs(build_dir, exist_ok=True)
     
     # generate timestamped report filenames
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -58,12 +74,15 @@ def run_cppcheck(input_dir, output_dir, report_format='html'):
         # include inconclusive results (important for security checks)
         '--inconclusive',
 
-        # force all configurations to be checked
-        '--force',
-
         # show progress
         '--verbose',
 
+        # check files in parallel on all cores
+        f'-j{os.cpu_count() or 1}',
+
+        # reuse results for unchanged files from previous runs
+        f'--cppcheck-build-dir={build_dir}',
+
         # XML output (for later HTML generation)
         '--xml',
         '--xml-version=2',
@@ -75,23 +94,48 @@ def run_cppcheck(input_dir, output_dir, report_format='html'):
         input_dir
     ]
 
+    # force all configurations to be checked; with many #ifdef variants this
+    # is the most expensive option, so it can be turned off
+    if force:
+        cppcheck_cmd.insert(-1, '--force')
+
     print(f"Starting directory scan: {input_dir}")
     print(f"Executing command: {' '.join(cppcheck_cmd)}")
     print("-" * 80)
 
     # Run cppcheck
     try:
-        result = subprocess.run(
+        proc = subprocess.Popen(
             cppcheck_cmd,
-            capture_output=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
             text=True,
-            timeout=3600  # timeout after 1 hour   
+            errors='replace',
+            bufsize=1  # line buffered
         )
 
-        # Print stderr (cppcheck progress information is in stderr)
-        if result.stderr:
+        # stderr is read until cppcheck exits, so enforce the timeout
+        # (1 hour) from a timer thread
+        timed_out = threading.Event()
+
+        def kill_on_timeout():
+            timed_out.set()
+            proc.kill()
+
+        timer = threading.Timer(3600, kill_on_timeout)
+        timer.start()
+        try:
+            # Print stderr as it arrives (cppcheck progress information is in stderr)
             print("Scan output:")
-            print(result.stderr)
+            for line in proc.stderr:
+                print(line, end='')
+            proc.wait()
+        finally:
+            timer.cancel()
+            proc.stderr.close()
+
+        if timed_out.is_set():
+            raise subprocess.TimeoutExpired(cppcheck_cmd, 3600)
         
         print("-" * 80)
         print(f"Scan completed! XML report saved to: {xml_report}")
@@ -146,35 +190,58 @@ def generate_html_report(xml_file, html_file):
     except Exception as e:
         print(f"HTML report generation error: {e}")
 
+def iter_errors(xml_file):
+    """
+    Yield the <error> elements of a cppcheck XML report one at a time.
+    Each element is freed after the caller is done with it, so the whole
+    tree is never held in memory.
+    """
+    if HAVE_LXML:
+        # tag filtering happens in C; entities are never expanded
+        for _, elem in ET.iterparse(xml_file, tag='error', resolve_entities=False):
+            yield elem
+            elem.clear(keep_tail=True)
+            # drop the already-seen siblings as well
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+        return
+
+    parent = None
+    for event, elem in ET.iterparse(xml_file, events=('start', 'end')):
+        if event == 'start':
+            if elem.tag == 'errors':
+                parent = elem
+            continue
+        if elem.tag != 'error':
+            continue
+
+        yield elem
+
+        # free the element and detach it from the already-seen siblings
+        elem.clear()
+        if parent is not None and len(parent) and parent[0] is elem:
+            del parent[0]
+
 def generate_text_summary(xml_file, text_file):
     """
     Generate text summary from XML file
     """
-    import xml.etree.ElementTree as ET
-    
     try:
-        tree = ET.parse(xml_file)
-        root = tree.getroot()
-
-        # Statistics
-        errors = root.findall('.//error')
-
         # Categorize by severity
-        severity_count = {}
-        issues_by_severity = {}
-        
-        for error in errors:
+        severity_count = Counter()
+        issues_by_severity = defaultdict(list)
+        total_issues = 0
+
+        for error in iter_errors(xml_file):
             severity = error.get('severity', 'unknown')
             msg = error.get('msg', '')
             file_location = error.find('location')
 
             # Statistics
-            severity_count[severity] = severity_count.get(severity, 0) + 1
+            total_issues += 1
+            severity_count[severity] += 1
 
             # Collect detailed information
-            if severity not in issues_by_severity:
-                issues_by_severity[severity] = []
-            
             issue_info = {
                 'msg': msg,
                 'id': error.get('id', ''),
@@ -183,50 +250,41 @@ def generate_text_summary(xml_file, text_file):
             }
             issues_by_severity[severity].append(issue_info)
 
-        # Write text report
-        with open(text_file, 'w', encoding='utf-8') as f:
-            f.write("=" * 80 + "\n")
-            f.write("Cppcheck Security Vulnerability Scan Report\n")
-            f.write(f"Generated Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("=" * 80 + "\n\n")
+        # Build the text report in memory and write it out in one call
+        parts = []
+        append = parts.append
+        append("=" * 80 + "\n")
+        append("Cppcheck Security Vulnerability Scan Report\n")
+        append(f"Generated Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        append("=" * 80 + "\n\n")
 
-            # Overall Statistics
-            f.write("Overall Statistics:\n")
-            f.write("-" * 80 + "\n")
-            f.write(f"Total Issues: {len(errors)}\n\n")
+        # Overall Statistics
+        append("Overall Statistics:\n")
+        append("-" * 80 + "\n")
+        append(f"Total Issues: {total_issues}\n\n")
 
-            for severity in sorted(severity_count.keys()):
-                f.write(f"  {severity.upper()}: {severity_count[severity]}\n")
-            
-            f.write("\n" + "=" * 80 + "\n\n")
+        for severity in sorted(severity_count.keys()):
+            append(f"  {severity.upper()}: {severity_count[severity]}\n")
+        
+        append("\n" + "=" * 80 + "\n\n")
 
-            # Categorize by severity
-            priority_order = ['error', 'warning', 'performance', 'portability', 'information']
+        # Categorize by severity, known severities first and any others
+        # after them in the order they were seen
+        priority_order = ['error', 'warning', 'performance', 'portability', 'information']
+        order = {severity: i for i, severity in enumerate(priority_order)}
+        
+        for severity in sorted(issues_by_severity, key=lambda s: order.get(s, len(order))):
+            append(f"\n{severity.upper()} ({len(issues_by_severity[severity])} issues):\n")
+            append("-" * 80 + "\n")
             
-            for severity in priority_order:
-                if severity not in issues_by_severity:
-                    continue
-
-                f.write(f"\n{severity.upper()} ({len(issues_by_severity[severity])} issues):\n")
-                f.write("-" * 80 + "\n")
-                
-                for idx, issue in enumerate(issues_by_severity[severity], 1):
-                    f.write(f"\n[{idx}] {issue['id']}\n")
-                    f.write(f"    File: {issue['file']}\n")
-                    f.write(f"    Line: {issue['line']}\n")
-                    f.write(f"    Description: {issue['msg']}\n")
-
-            # Add other severities not in priority order
-            for severity in issues_by_severity:
-                if severity not in priority_order:
-                    f.write(f"\n{severity.upper()} ({len(issues_by_severity[severity])} issues):\n")
-                    f.write("-" * 80 + "\n")
-                    
-                    for idx, issue in enumerate(issues_by_severity[severity], 1):
-                        f.write(f"\n[{idx}] {issue['id']}\n")
-                        f.write(f"    File: {issue['file']}\n")
-                        f.write(f"    Line: {issue['line']}\n")
-                        f.write(f"    Description: {issue['msg']}\n")
+            for idx, issue in enumerate(issues_by_severity[severity], 1):
+                append(f"\n[{idx}] {issue['id']}\n"
+                       f"    File: {issue['file']}\n"
+                       f"    Line: {issue['line']}\n"
+                       f"    Description: {issue['msg']}\n")
+
+        with open(text_file, 'w', encoding='utf-8') as f:
+            f.write(''.join(parts))
 
         print(f"Text summary has been saved to: {text_file}")
 
@@ -234,7 +292,7 @@ def generate_text_summary(xml_file, text_file):
         print("\n" + "=" * 80)
         print("Scan Results Summary:")
         print("-" * 80)
-        print(f"Total Issues: {len(errors)}")
+        print(f"Total Issues: {total_issues}")
         for severity in sorted(severity_count.keys()):
             print(f"  {severity.upper()}: {severity_count[severity]}")
         print("=" * 80)
@@ -288,9 +346,14 @@ def scan_single_file(file_path, output_dir):
         print(f"Error occurred: {e}")
 
 if __name__ == "__main__":
+    # --no-force skips checking every preprocessor configuration (faster)
+    force = '--no-force' not in sys.argv
+    if not force:
+        sys.argv.remove('--no-force')
+
     if len(sys.argv) < 3:
         print("Usage:")
-        print("  Scan Directory: python script.py <input_dir> <output_dir> [html|text|both]")
+        print("  Scan Directory: python script.py <input_dir> <output_dir> [html|text|both] [--no-force]")
         print("  Scan Single File: python script.py --file <file_path> <output_dir>")
         print("\nExamples:")
         print("  python script.py ./bad_dataset ./reports html")
@@ -313,7 +376,7 @@ if __name__ == "__main__":
             print(f"Error occurred: Input directory does not exist: {input_dir}")
             sys.exit(1)
         
-        reports = run_cppcheck(input_dir, output_dir, report_format)
+        reports = run_cppcheck(input_dir, output_dir, report_format, force)
         
         if reports:
             print("\n" + "=" * 80)
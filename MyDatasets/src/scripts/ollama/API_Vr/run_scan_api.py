@@ -3,6 +3,11 @@
 
 import argparse
 import os
+import sys
+
+# config.py (and scanner_openai.py) are shared with the Ollama scanner one
+# directory up, so this works without running from there
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import SCAN_PATTERN
 
 def main():
@@ -21,6 +26,12 @@ def main():
                        help='Which API to use: openai or claude')
     parser.add_argument('--key', help='API key (or set OPENAI_API_KEY/ANTHROPIC_API_KEY env var)')
     parser.add_argument('--model', help='Model name (optional, uses defaults)')
+    parser.add_argument('-w', '--workers', type=int, default=8,
+                       help='Number of concurrent API requests (default: 8)')
+    parser.add_argument('--batch', action='store_true',
+                       help='Submit all files as one Message Batch (claude only, half price, slower turnaround)')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Do not reuse cached results for unchanged files (claude only)')
     
     args = parser.parse_args()
     
@@ -50,17 +61,23 @@ def main():
     if args.api == 'openai':
         from scanner_openai import VulnerabilityScannerOpenAI
         model = args.model or "gpt-4o-mini"  # Fast and cheap
-        scanner = VulnerabilityScannerOpenAI(api_key=api_key, model=model)
+        scanner = VulnerabilityScannerOpenAI(api_key=api_key, model=model,
+                                             workers=args.workers)
         print(f"Model: {model}")
     else:  # claude
         from scanner_claude import VulnerabilityScannerClaude
         model = args.model or "claude-3-5-haiku-20241022"  # Fast and cheap
-        scanner = VulnerabilityScannerClaude(api_key=api_key, model=model)
+        scanner = VulnerabilityScannerClaude(api_key=api_key, model=model,
+                                             concurrency=args.workers,
+                                             use_cache=not args.no_cache)
         print(f"Model: {model}")
     
     # Scan
     try:
-        results = scanner.scan_directory(args.directory, args.pattern, max_files=args.test)
+        if args.batch and args.api == 'claude':
+            results = scanner.scan_directory_batch(args.directory, args.pattern, max_files=args.test)
+        else:
+            results = scanner.scan_directory(args.directory, args.pattern, max_files=args.test)
         
         if results:
             scanner.save_results(results, args.output)
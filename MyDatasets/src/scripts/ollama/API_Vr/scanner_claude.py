@@ -1,23 +1,94 @@
 # scanner_claude.py
 # Usage: Claude-based vulnerability scanner (minimal changes from original)
 
+import asyncio
+import hashlib
 import json
 import os
+import shelve
 from pathlib import Path
 from datetime import datetime
 import time
 import anthropic
+import httpx
+
+# optional; writes the results file faster
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import h2  # noqa: F401  (lets httpx speak HTTP/2, optional)
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
 from config import DELAY_BETWEEN_FILES, OUTPUT_DIR
+from scanner import KEYWORD_RE
+
+RATE_LIMIT_RETRIES = 3  # retries per file after a 429 response
+MAX_CODE_CHARS = 8000  # code sent to the model per file
+# bytes read per file; UTF-8 takes at most 4 bytes per char, so this always
+# decodes to at least MAX_CODE_CHARS chars when the file is larger
+READ_LIMIT = MAX_CODE_CHARS * 4
+BATCH_MAX_REQUESTS = 10000  # requests per Message Batch submission
+BATCH_POLL_INTERVAL = 30  # seconds between batch status checks
+# bump when the prompt or response handling changes to invalidate the cache
+PROMPT_VERSION = b'1'
+CACHE_FILE = os.path.join(OUTPUT_DIR, 'cache.db')
+
+_JSON_DECODER = json.JSONDecoder()
+
+
+class AdaptiveRateLimiter:
+    """Space out request starts; back off on 429 and recover on success"""
+
+    def __init__(self, backoff=DELAY_BETWEEN_FILES, max_interval=60.0):
+        self.interval = 0.0  # no throttling until the API asks for it
+        self.backoff = max(backoff, 0.1)
+        self.max_interval = max_interval
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            delay = self._next_start - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_start = loop.time() + self.interval
+
+    def on_rate_limited(self):
+        self.interval = min(max(self.interval * 2, self.backoff), self.max_interval)
+
+    def on_success(self):
+        self.interval *= 0.9
+        if self.interval < 0.01:
+            self.interval = 0.0
+
 
 class VulnerabilityScannerClaude:
-    def __init__(self, api_key, model="claude-3-5-haiku-20241022"):
+    def __init__(self, api_key, model="claude-3-5-haiku-20241022", concurrency=8,
+                 use_cache=True):
         """
         Args:
             api_key: Anthropic API key
             model: Model name (haiku is fast/cheap, sonnet is more accurate)
+            concurrency: Maximum number of requests in flight in scan_directory
+            use_cache: Reuse stored results for byte-identical prompts
         """
-        self.client = anthropic.Anthropic(api_key=api_key)
+        self.api_key = api_key
         self.model = model
+        self.concurrency = concurrency
+        # keep-alive connections (HTTP/2 when h2 is installed) are reused
+        # across requests instead of paying a TCP+TLS handshake per file
+        self.client = anthropic.Anthropic(
+            api_key=api_key,
+            http_client=anthropic.DefaultHttpxClient(
+                http2=HTTP2, limits=self._http_limits(concurrency))
+        )
+        self.use_cache = use_cache
+        self._cache = None
         self.scan_count = 0
         self.success_count = 0
         self.fail_count = 0
@@ -37,87 +108,175 @@ Respond in JSON format:
   "confidence": 0-100
 }}"""
     
+    @staticmethod
+    def _http_limits(connections):
+        """Connection pool limits for the httpx transport"""
+        return httpx.Limits(max_connections=max(connections, 16),
+                            max_keepalive_connections=max(connections, 16),
+                            keepalive_expiry=60)
+    
     def read_file(self, file_path):
-        """Read file with encoding fallback"""
-        for encoding in ['utf-8', 'gbk', 'latin-1']:
-            try:
-                with open(file_path, 'r', encoding=encoding) as f:
-                    return f.read()
-            except UnicodeDecodeError:
-                continue
-        raise Exception("Cannot read file with common encodings")
+        """Read the head of a file; return (text, file size in bytes)
+
+        Only READ_LIMIT bytes are read since the prompt is truncated to
+        MAX_CODE_CHARS anyway; undecodable bytes are replaced.
+        """
+        with open(file_path, 'rb') as f:
+            file_size = os.fstat(f.fileno()).st_size
+            raw = f.read(READ_LIMIT)
+        return raw.decode('utf-8', errors='replace'), file_size
     
     def parse_response(self, response_text):
         """Parse JSON response"""
-        try:
-            start = response_text.find('{')
-            end = response_text.rfind('}') + 1
-            if start != -1 and end > start:
-                json_str = response_text[start:end]
-                data = json.loads(json_str)
-                return {
-                    'parsed': True,
-                    'has_vulnerability': data.get('has_vulnerability', False),
-                    'vulnerability_type': data.get('vulnerability_type', 'unknown'),
-                    'line_numbers': data.get('line_numbers', []),
-                    'severity': data.get('severity', 'unknown'),
-                    'description': data.get('description', ''),
-                    'confidence': data.get('confidence', 0)
-                }
-        except:
-            pass
-        
-        response_lower = response_text.lower()
-        has_vuln = any(kw in response_lower for kw in 
-                      ['buffer overflow', 'vulnerable', 'overflow'])
+        # Decode the first JSON object in the reply; text or braces around it
+        # (code snippets, a second object) are ignored
+        start = response_text.find('{')
+        while start != -1:
+            try:
+                data, _ = _JSON_DECODER.raw_decode(response_text, start)
+            except json.JSONDecodeError:
+                start = response_text.find('{', start + 1)
+                continue
+            return {
+                'parsed': True,
+                'has_vulnerability': data.get('has_vulnerability', False),
+                'vulnerability_type': data.get('vulnerability_type', 'unknown'),
+                'line_numbers': data.get('line_numbers', []),
+                'severity': data.get('severity', 'unknown'),
+                'description': data.get('description', ''),
+                'confidence': data.get('confidence', 0)
+            }
+        
+        has_vuln = KEYWORD_RE.search(response_text) is not None
         return {
             'parsed': False,
-            'has_vulnerability': has_vuln,
-            'raw_response': response_text[:500]
+            'has_vulnerability': has_vuln
         }
     
-    def scan_single_file(self, file_path):
-        """Scan a single file"""
+    def _start_result(self, file_path):
+        """Create the result record for a file"""
         self.scan_count += 1
-        result = {
+        return {
             'file': str(file_path),
             'file_name': Path(file_path).name,
             'scan_number': self.scan_count,
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': time.time(),
             'success': False,
             'api_used': f'Anthropic {self.model}'
         }
+    
+    def _build_prompt(self, file_path, result):
+        """Read the file and build the prompt, recording file stats in result"""
+        code, file_size = self.read_file(file_path)
+        result['file_size'] = file_size
+        # only known when the whole file was read, left out otherwise
+        if file_size <= READ_LIMIT:
+            result['line_count'] = code.count('\n') + 1
+        
+        # Limit code length
+        if len(code) > MAX_CODE_CHARS or file_size > READ_LIMIT:
+            code = code[:MAX_CODE_CHARS]
+            result['note'] = f'Code truncated to {MAX_CODE_CHARS} chars'
+        
+        return self.prompt_template.replace('{code_content}', code)
+    
+    def _message_params(self, prompt):
+        """Request parameters for the Messages API"""
+        return {
+            'model': self.model,
+            'max_tokens': 1024,
+            'temperature': 0.1,
+            'messages': [{"role": "user", "content": prompt}]
+        }
+    
+    def _cache_key(self, prompt):
+        """Key a prompt (template + code) together with the model"""
+        data = prompt.encode('utf-8') + b'\0' + self.model.encode('utf-8') + b'\0' + PROMPT_VERSION
+        return hashlib.blake2b(data).hexdigest()
+    
+    def _open_cache(self):
+        if self._cache is None:
+            os.makedirs(OUTPUT_DIR, exist_ok=True)
+            self._cache = shelve.open(CACHE_FILE)
+        return self._cache
+    
+    def close_cache(self):
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+    
+    def _record_response(self, result, response_text, tokens_used):
+        """Store the parsed Claude reply in result"""
+        result.update({
+            'success': True,
+            'model_response': response_text,
+            'analysis': self.parse_response(response_text),
+            'tokens_used': tokens_used
+        })
+        self.success_count += 1
+    
+    def _record_cached(self, result, prompt):
+        """Fill result from the cache; return False on a miss"""
+        if not self.use_cache:
+            return False
+        
+        cached = self._open_cache().get(self._cache_key(prompt))
+        if cached is None:
+            return False
+        
+        self._record_response(result, cached['model_response'], 0)
+        result['cached'] = True
+        return True
+    
+    def _record_message(self, result, message, prompt):
+        """Store a Claude reply in result and in the cache"""
+        response_text = message.content[0].text
+        self._record_response(result, response_text,
+                              message.usage.input_tokens + message.usage.output_tokens)
+        
+        if self.use_cache:
+            self._open_cache()[self._cache_key(prompt)] = {'model_response': response_text}
+    
+    def scan_single_file(self, file_path):
+        """Scan a single file"""
+        result = self._start_result(file_path)
         
         try:
-            code = self.read_file(file_path)
-            result['file_size'] = len(code)
-            result['line_count'] = code.count('\n') + 1
-            
-            # Limit code length
-            if len(code) > 8000:
-                code = code[:8000]
-                result['note'] = 'Code truncated to 8000 chars'
+            prompt = self._build_prompt(file_path, result)
             
-            prompt = self.prompt_template.replace('{code_content}', code)
+            if not self._record_cached(result, prompt):
+                # Call Claude API
+                message = self.client.messages.create(**self._message_params(prompt))
+                self._record_message(result, message, prompt)
             
-            # Call Claude API
-            message = self.client.messages.create(
-                model=self.model,
-                max_tokens=1024,
-                temperature=0.1,
-                messages=[{"role": "user", "content": prompt}]
-            )
+        except Exception as e:
+            result['error'] = str(e)
+            self.fail_count += 1
+        
+        return result
+    
+    async def scan_single_file_async(self, client, file_path, limiter):
+        """Scan a single file with an AsyncAnthropic client"""
+        result = self._start_result(file_path)
+        
+        try:
+            prompt = self._build_prompt(file_path, result)
+            if self._record_cached(result, prompt):
+                return result
             
-            response_text = message.content[0].text
-            parsed = self.parse_response(response_text)
+            params = self._message_params(prompt)
+            for attempt in range(RATE_LIMIT_RETRIES + 1):
+                await limiter.wait()
+                try:
+                    message = await client.messages.create(**params)
+                    break
+                except anthropic.RateLimitError:
+                    if attempt == RATE_LIMIT_RETRIES:
+                        raise
+                    limiter.on_rate_limited()
             
-            result.update({
-                'success': True,
-                'model_response': response_text,
-                'analysis': parsed,
-                'tokens_used': message.usage.input_tokens + message.usage.output_tokens
-            })
-            self.success_count += 1
+            limiter.on_success()
+            self._record_message(result, message, prompt)
             
         except Exception as e:
             result['error'] = str(e)
@@ -125,8 +284,41 @@ Respond in JSON format:
         
         return result
     
-    def scan_directory(self, directory, pattern='*.c', max_files=None):
-        """Scan directory (same interface)"""
+    async def _scan_files_async(self, files):
+        """Scan files keeping up to self.concurrency requests in flight"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limiter = AdaptiveRateLimiter()
+        total = len(files)
+        done = 0
+        
+        async def scan(client, file_path):
+            nonlocal done
+            async with semaphore:
+                result = await self.scan_single_file_async(client, file_path, limiter)
+            
+            done += 1
+            print(f"\n[{done}/{total}] Scanned: {file_path.name}")
+            if result['success']:
+                vuln = result['analysis'].get('has_vulnerability', False)
+                status = "⚠ Vulnerability found" if vuln else "✓ Clean"
+                print(f"  Status: {status}")
+            else:
+                print(f"  ✗ Error: {result.get('error', 'Unknown')}")
+            return result
+        
+        client = anthropic.AsyncAnthropic(
+            api_key=self.api_key,
+            http_client=anthropic.DefaultAsyncHttpxClient(
+                http2=HTTP2, limits=self._http_limits(self.concurrency))
+        )
+        try:
+            # gather keeps the results in file order
+            return await asyncio.gather(*(scan(client, fp) for fp in files))
+        finally:
+            await client.close()
+    
+    def _find_files(self, directory, pattern, max_files):
+        """List files to scan, limited to max_files (test mode)"""
         directory_path = Path(directory)
         if not directory_path.exists():
             raise FileNotFoundError(f"Directory not found: {directory}")
@@ -142,24 +334,91 @@ Respond in JSON format:
         else:
             files = all_files
             print(f"\nFound {len(files)} files to scan")
+        return files
+    
+    def scan_directory(self, directory, pattern='*.c', max_files=None):
+        """Scan directory (same interface)"""
+        files = self._find_files(directory, pattern, max_files)
+        if not files:
+            return []
         
+        print(f"Concurrency: {self.concurrency}")
         print("=" * 60)
+        try:
+            return list(asyncio.run(self._scan_files_async(files)))
+        finally:
+            self.close_cache()
+    
+    def scan_directory_batch(self, directory, pattern='*.c', max_files=None):
+        """Scan directory through the Message Batches API (same interface)
+        
+        All prompts are submitted at once and the results are collected when
+        the batch has ended, at half the cost of individual requests.
+        """
+        files = self._find_files(directory, pattern, max_files)
+        if not files:
+            return []
+        
+        print("=" * 60)
+        results = []
+        try:
+            for offset in range(0, len(files), BATCH_MAX_REQUESTS):
+                results.extend(self._scan_batch(files[offset:offset + BATCH_MAX_REQUESTS]))
+        finally:
+            self.close_cache()
+        return results
+    
+    def _scan_batch(self, files):
+        """Submit one Message Batch for files and wait for its results"""
         results = []
+        pending = {}  # custom_id -> (result, prompt)
+        requests = []
         
-        for i, file_path in enumerate(files, 1):
-            print(f"\n[{i}/{len(files)}] Scanning: {file_path.name}")
-            result = self.scan_single_file(file_path)
+        for i, file_path in enumerate(files):
+            result = self._start_result(file_path)
             results.append(result)
+            try:
+                prompt = self._build_prompt(file_path, result)
+            except Exception as e:
+                result['error'] = str(e)
+                self.fail_count += 1
+                continue
             
-            if result['success']:
-                vuln = result['analysis'].get('has_vulnerability', False)
-                status = "⚠ Vulnerability found" if vuln else "✓ Clean"
-                print(f"  Status: {status}")
-            else:
-                print(f"  ✗ Error: {result.get('error', 'Unknown')}")
+            if self._record_cached(result, prompt):
+                continue
+            
+            # custom_id only allows [a-zA-Z0-9_-], so use the position
+            custom_id = f'file-{i}'
+            pending[custom_id] = (result, prompt)
+            requests.append({'custom_id': custom_id, 'params': self._message_params(prompt)})
+        
+        if not requests:
+            return results
+        
+        batch = self.client.messages.batches.create(requests=requests)
+        print(f"\nSubmitted batch {batch.id} ({len(requests)} requests)")
+        
+        while batch.processing_status != 'ended':
+            time.sleep(BATCH_POLL_INTERVAL)
+            batch = self.client.messages.batches.retrieve(batch.id)
+            counts = batch.request_counts
+            print(f"  Processing: {counts.processing} | Succeeded: {counts.succeeded} | "
+                  f"Errored: {counts.errored}")
+        
+        for entry in self.client.messages.batches.results(batch.id):
+            result, prompt = pending.pop(entry.custom_id, (None, None))
+            if result is None:
+                continue
             
-            if i < len(files):
-                time.sleep(DELAY_BETWEEN_FILES)
+            if entry.result.type == 'succeeded':
+                self._record_message(result, entry.result.message, prompt)
+            else:
+                result['error'] = f'Batch request {entry.result.type}'
+                self.fail_count += 1
+        
+        for result, _ in pending.values():
+            result['error'] = 'No result returned for batch request'
+            self.fail_count += 1
         
         return results
     
@@ -171,8 +430,12 @@ Respond in JSON format:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             output_file = os.path.join(OUTPUT_DIR, f'scan_results_claude_{timestamp}.json')
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
+        if orjson is not None:
+            with open(output_file, 'wb') as f:
+                f.write(orjson.dumps(results, default=str, option=orjson.OPT_INDENT_2))
+        else:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, ensure_ascii=False)
         
         print("\n" + "=" * 60)
         print("Scan complete!")
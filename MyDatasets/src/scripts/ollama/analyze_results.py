@@ -4,44 +4,82 @@
 import json
 import argparse
 from pathlib import Path
+from datetime import datetime
 from collections import Counter
+from itertools import chain, islice
+
+# optional; loads large results files faster
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 def load_results(result_file):
-    # load JSON results from file
-    with open(result_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    # load JSON results from file: either one JSON array or JSON Lines (one
+    # result per line). The format is taken from the content, not the file
+    # extension, since run_scan.py -o may give a JSON Lines file any name
+    loads = orjson.loads if orjson is not None else json.loads
+    with open(result_file, 'rb') as f:
+        data = f.read()
+    if data.lstrip()[:1] == b'[':
+        return loads(data)
+    return [loads(line) for line in data.splitlines() if line.strip()]
+
+def load_all_results(result_files):
+    # results of several runs (e.g. a scan resumed in several sessions) as
+    # one list; a file found in more than one run counts once, with the
+    # result from the last run given
+    if len(result_files) == 1:
+        return load_results(result_files[0])
+    merged = {}
+    for result_file in result_files:
+        for result in load_results(result_file):
+            merged.pop(result.get('file'), None)  # keep the latest, in run order
+            merged[result.get('file')] = result
+    return list(merged.values())
 
 def analyze_results(results):
-    # analyze scan results
-    total = len(results)
-    success = sum(1 for r in results if r.get('success'))
-    failed = total - success
-
-    # count vulnerabilities
+    # analyze scan results in a single pass (results can be any iterable)
+    total = 0
+    success = 0
     vulnerabilities = []
     no_vulnerabilities = []
+    severity_counter = Counter()
+    first_ts = last_ts = None
+
+    add_vuln = vulnerabilities.append
+    add_safe = no_vulnerabilities.append
+    get = dict.get
     
     for result in results:
-        if result.get('success'):
-            analysis = result.get('analysis', {})
-            if analysis.get('has_vulnerability'):
-                vulnerabilities.append(result)
-            else:
-                no_vulnerabilities.append(result)
-
-    # count severity
-    severity_counter = Counter()
-    for vuln in vulnerabilities:
-        severity = vuln.get('analysis', {}).get('severity', 'unknown')
-        severity_counter[severity] += 1
+        total += 1
+        # epoch seconds; older result files hold ISO strings, which are skipped
+        ts = get(result, 'timestamp')
+        if isinstance(ts, (int, float)):
+            if first_ts is None or ts < first_ts:
+                first_ts = ts
+            if last_ts is None or ts > last_ts:
+                last_ts = ts
+        if not get(result, 'success'):
+            continue
+        success += 1
+        analysis = get(result, 'analysis') or {}
+        if get(analysis, 'has_vulnerability'):
+            add_vuln(result)
+            # count severity
+            severity_counter[get(analysis, 'severity', 'unknown')] += 1
+        else:
+            add_safe(result)
     
     return {
         'total': total,
         'success': success,
-        'failed': failed,
+        'failed': total - success,
         'vulnerabilities': vulnerabilities,
         'no_vulnerabilities': no_vulnerabilities,
-        'severity_stats': dict(severity_counter)
+        'severity_stats': dict(severity_counter),
+        'first_timestamp': first_ts,
+        'last_timestamp': last_ts
     }
 
 def print_summary(stats):
@@ -54,6 +92,11 @@ def print_summary(stats):
     print(f"Successfully scanned: {stats['success']} ({stats['success']/stats['total']*100:.1f}%)")
     print(f"Scan failed: {stats['failed']}")
 
+    if stats.get('first_timestamp') is not None:
+        start = datetime.fromtimestamp(stats['first_timestamp']).isoformat(timespec='seconds')
+        end = datetime.fromtimestamp(stats['last_timestamp']).isoformat(timespec='seconds')
+        print(f"Scan period: {start} - {end}")
+
     vuln_count = len(stats['vulnerabilities'])
     safe_count = len(stats['no_vulnerabilities'])
 
@@ -74,18 +117,19 @@ def print_vulnerability_list(vulnerabilities, limit=10):
     print(f"\nVulnerabilities found in files (showing top {min(limit, len(vulnerabilities))}):")
     print("-" * 60)
     
-    for i, vuln in enumerate(vulnerabilities[:limit], 1):
-        analysis = vuln.get('analysis', {})
+    get = dict.get
+    for i, vuln in enumerate(islice(vulnerabilities, limit), 1):
+        analysis = get(vuln, 'analysis', {})
         print(f"\n{i}. {vuln['file_name']}")
         print(f"   Path: {vuln['file']}")
-        print(f"   Severity: {analysis.get('severity', 'unknown')}")
+        print(f"   Severity: {get(analysis, 'severity', 'unknown')}")
 
-        if 'description' in analysis:
-            desc = analysis['description'][:100]
-            print(f"   Description: {desc}...")
+        desc = get(analysis, 'description')
+        if desc is not None:
+            print(f"   Description: {desc[:100]}...")
         
-        if analysis.get('line_numbers'):
-            lines = analysis['line_numbers']
+        lines = get(analysis, 'line_numbers')
+        if lines:
             print(f"   Line numbers: {lines}")
 
 def compare_with_cppcheck(ollama_results_file, cppcheck_results_file):
@@ -97,26 +141,29 @@ def export_csv(stats, output_file):
     # export simple statistics in CSV format
     import csv
     
-    with open(output_file, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(['File Name', 'Path', 'Has Vulnerability', 'Severity', 'Description'])
-        
-        all_files = stats['vulnerabilities'] + stats['no_vulnerabilities']
-        for result in all_files:
+    def rows():
+        for result in chain(stats['vulnerabilities'], stats['no_vulnerabilities']):
             analysis = result.get('analysis', {})
-            writer.writerow([
+            yield (
                 result['file_name'],
                 result['file'],
                 'Yes' if analysis.get('has_vulnerability') else 'No',
                 analysis.get('severity', 'N/A'),
                 analysis.get('description', '')[:100]
-            ])
+            )
+    
+    with open(output_file, 'w', newline='', encoding='utf-8', buffering=1 << 20) as f:
+        writer = csv.writer(f)
+        writer.writerow(['File Name', 'Path', 'Has Vulnerability', 'Severity', 'Description'])
+        writer.writerows(rows())
 
     print(f"\nCSV exported to: {output_file}")
 
 def main():
     parser = argparse.ArgumentParser(description='Analyze vulnerability scan results')
-    parser.add_argument('result_file', help='Scan results JSON file path')
+    parser.add_argument('result_files', nargs='+', metavar='result_file',
+                       help='Scan results JSON or JSONL file path; give every results file '
+                            'of a resumed scan, oldest first, to analyze the scan as a whole')
     parser.add_argument('-l', '--limit', type=int, default=10,
                        help='Limit the number of vulnerability files displayed')
     parser.add_argument('-c', '--csv', help='Path to export CSV file')
@@ -126,7 +173,7 @@ def main():
     args = parser.parse_args()
 
     # Load results
-    results = load_results(args.result_file)
+    results = load_all_results(args.result_files)
 
     # Analyze results
     stats = analyze_results(results)
@@ -9,6 +9,10 @@ MODEL_NAME = "codellama:7b-instruct-q4_0"
 SCAN_PATTERN = "*.c"  # can be changed to "*.cpp" or other patterns
 DELAY_BETWEEN_FILES = 1  # seconds to wait between each file
 REQUEST_TIMEOUT = 120  # API request timeout in seconds
+KEEP_ALIVE = -1  # keep the model loaded between requests (-1 = until Ollama stops)
+MODEL_LOAD_TIMEOUT = 300  # seconds allowed for the initial model load
+MAX_CODE_CHARS = 12000  # longer files are truncated before being sent to the model
+RECORD_LINE_COUNT = False  # store each file's line count in the results
 
 # Prompt template for vulnerability scanning
 VULNERABILITY_PROMPT = """Find security vulnerabilities in this code:
@@ -22,6 +26,8 @@ JSON output:
   "line": 0,
   "reason": "brief"
 }}"""
+# static text around the code, split once so each prompt is a simple concatenation
+PROMPT_PREFIX, PROMPT_SUFFIX = VULNERABILITY_PROMPT.split("{code_content}", 1)
 # output configuration
 OUTPUT_DIR = "results"
 SAVE_INDIVIDUAL_FILES = True  # whether to save results for each scanned file individually
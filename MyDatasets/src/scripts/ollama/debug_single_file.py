@@ -3,9 +3,15 @@
 # 用于调试单个文件扫描问题
 
 import sys
+import json
 import traceback
 from scanner import VulnerabilityScanner
 
+try:
+    import orjson  # 更快的JSON解析, 可选
+except ImportError:
+    orjson = None
+
 def debug_scan(file_path):
     """调试单个文件的扫描过程"""
     print("=" * 60)
@@ -18,7 +24,7 @@ def debug_scan(file_path):
     try:
         # 步骤1: 读取文件
         print("步骤1: 读取文件内容...")
-        code = scanner.read_file(file_path)
+        code, _ = scanner.read_file(file_path)
         print(f"✓ 文件读取成功 ({len(code)} 字符)")
         print(f"前100个字符: {code[:100]}...\n")
         
@@ -30,7 +36,6 @@ def debug_scan(file_path):
         
         # 步骤3: 调用API
         print("步骤3: 调用Ollama API...")
-        import requests
         from config import OLLAMA_API_URL, MODEL_NAME
         
         payload = {
@@ -40,12 +45,13 @@ def debug_scan(file_path):
             "temperature": 0.1
         }
         
-        response = requests.post(OLLAMA_API_URL, json=payload, timeout=60)
+        # 复用扫描器的keep-alive连接
+        response = scanner.session.post(OLLAMA_API_URL, json=payload, timeout=60)
         print(f"✓ API响应状态码: {response.status_code}\n")
         
         # 步骤4: 解析响应
         print("步骤4: 解析响应...")
-        result = response.json()
+        result = orjson.loads(response.content) if orjson is not None else json.loads(response.content)
         print(f"响应keys: {result.keys()}")
         print(f"\n完整响应:")
         print(result)
@@ -2,9 +2,18 @@
 # usage: Batch scan C/C++ code for buffer overflow vulnerabilities using Ollama API
 
 import argparse
+import asyncio
 from scanner import VulnerabilityScanner
 from config import SCAN_PATTERN
 
+def print_no_results(scanner):
+    # nothing was saved: either every file was skipped by the resume index,
+    # or there was nothing to scan
+    if scanner.skipped_count:
+        print("\nNo new files to scan, no results file written")
+    else:
+        print("\nNo files found or scan failed")
+
 def main():
     # set up argument parser
     parser = argparse.ArgumentParser(
@@ -31,6 +40,28 @@ def main():
         metavar='N',
         help='Test mode: only scan the first N files (default: 5)'
     )
+    parser.add_argument(
+        '--json',
+        action='store_true',
+        help='Save all results as one JSON array at the end instead of streaming JSON Lines'
+    )
+    parser.add_argument(
+        '--rescan',
+        action='store_true',
+        help='Scan every file again, ignoring files already scanned by earlier runs'
+    )
+    parser.add_argument(
+        '--async',
+        dest='use_async',
+        action='store_true',
+        help='Issue requests from one asyncio event loop (httpx) instead of threads'
+    )
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=4,
+        help='Number of files scanned concurrently (default: 4)'
+    )
     
     args = parser.parse_args()
     
@@ -42,18 +73,40 @@ def main():
 
     if args.test:
         print(f"Test mode: only scan the first {args.test} files")
+    print(f"Workers: {args.workers}")
 
     # Create scanner instance
-    scanner = VulnerabilityScanner()
+    if args.use_async:
+        from scanner_async import AsyncVulnerabilityScanner
+        scanner = AsyncVulnerabilityScanner(workers=args.workers)
+    else:
+        scanner = VulnerabilityScanner(workers=args.workers)
 
     # Scan (limit file count in test mode)
-    results = scanner.scan_directory(args.directory, args.pattern, max_files=args.test)
+    if args.json:
+        if args.use_async:
+            results = asyncio.run(scanner.scan_directory(args.directory, args.pattern,
+                                                         max_files=args.test,
+                                                         resume=not args.rescan))
+        else:
+            results = scanner.scan_directory(args.directory, args.pattern, max_files=args.test,
+                                             resume=not args.rescan)
 
-    # Save results
-    if results:
-        scanner.save_results(results, args.output)
+        # Save results
+        if not results:
+            print_no_results(scanner)
+        else:
+            scanner.save_results(results, args.output)
     else:
-        print("\nNo files found or scan failed")
+        # write each result to disk as soon as it is scanned
+        results = scanner.iter_scan(args.directory, args.pattern, max_files=args.test,
+                                    resume=not args.rescan)
+        if args.use_async:
+            output_file = asyncio.run(scanner.save_results_jsonl_async(results, args.output))
+        else:
+            output_file = scanner.save_results_jsonl(results, args.output)
+        if output_file is None:
+            print_no_results(scanner)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,193 +2,568 @@
 # usage: Ollama-based C/C++ vulnerability scanner implementation
 
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import os
+import re
+import hashlib
+import fnmatch
 from pathlib import Path
 from datetime import datetime
 import time
-import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+# optional; escapes the code into request bodies, parses the streamed
+# replies and writes the results files
+try:
+    import orjson
+except ImportError:
+    orjson = None
 from config import (
-    OLLAMA_API_URL, MODEL_NAME, VULNERABILITY_PROMPT,
-    DELAY_BETWEEN_FILES, REQUEST_TIMEOUT, OUTPUT_DIR
+    OLLAMA_API_URL, MODEL_NAME, PROMPT_PREFIX, PROMPT_SUFFIX,
+    DELAY_BETWEEN_FILES, REQUEST_TIMEOUT, OUTPUT_DIR, MAX_CODE_CHARS,
+    KEEP_ALIVE, MODEL_LOAD_TIMEOUT, RECORD_LINE_COUNT
 )
 
+# append-only list of files already scanned successfully, used to resume
+SCANNED_INDEX = os.path.join(OUTPUT_DIR, '.scanned.idx')
+# model and prompt template the index entries were made with; a changed
+# MODEL_NAME or VULNERABILITY_PROMPT gives every file a new key, so the
+# files are scanned again instead of being skipped
+_SCAN_CONFIG_ID = hashlib.sha1(
+    f"{MODEL_NAME}\0{PROMPT_PREFIX}{{code_content}}{PROMPT_SUFFIX}".encode('utf-8')
+).hexdigest()
+
+def json_fragment(text):
+    # text JSON-escaped, without the surrounding quotes; escaping works per
+    # character, so fragments can be concatenated inside one JSON string
+    if orjson is not None:
+        return orjson.dumps(text)[1:-1]
+    return json.dumps(text)[1:-1].encode('ascii')
+
+# the static parts of the prompt, escaped once instead of on every request
+_PROMPT_PREFIX_JSON = json_fragment(PROMPT_PREFIX)
+_PROMPT_SUFFIX_JSON = json_fragment(PROMPT_SUFFIX)
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+# keywords for the fallback when a response has no usable JSON; KEYWORD_RE
+# is shared with the API scanners, the local model's check adds two more
+KEYWORD_RE = re.compile(r'buffer overflow|vulnerable|overflow', re.IGNORECASE)
+_KEYWORD_RE = re.compile(r'buffer overflow|vulnerable|vulnerability|overflow|gets\(', re.IGNORECASE)
+
+def scanned_key(file_path):
+    # identifies one version of a file (same path and mtime means same
+    # content) scanned with the current model and prompt
+    stamp = f"{_SCAN_CONFIG_ID}:{file_path}:{os.stat(file_path).st_mtime_ns}"
+    return hashlib.sha1(stamp.encode('utf-8')).hexdigest()
+
+def load_scanned_index(index_path=SCANNED_INDEX):
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            return set(line.strip() for line in f)
+    except FileNotFoundError:
+        return set()
+
+def find_analysis(data):
+    # the dict carrying has_vulnerability: data itself, else the first one
+    # nested in it (answers like {"analysis": {...}}); None if there is none
+    if 'has_vulnerability' in data:
+        return data
+    for value in data.values():
+        if isinstance(value, dict):
+            found = find_analysis(value)
+            if found is not None:
+                return found
+    return None
+
+def truncate_code(code, limit):
+    """Cut code to at most limit chars, preferably right after a top-level
+    closing brace (end of a function), else at the last full line"""
+    if len(code) <= limit:
+        return code
+    cut = code.rfind('\n}\n', 0, limit)
+    if cut != -1:
+        return code[:cut + 3]
+    cut = code.rfind('\n', 0, limit)
+    if cut > 0:
+        return code[:cut + 1]
+    return code[:limit]
+
+def iter_files(directory, pattern='*.c'):
+    """Yield Paths of files under directory whose name matches pattern
+    
+    Walks the tree lazily with os.scandir (like Path.rglob, but without
+    listing everything first), so a caller that stops early stops the walk.
+    """
+    stack = [directory]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif fnmatch.fnmatch(entry.name, pattern) and entry.is_file():
+                yield Path(entry.path)
+        # visit subdirectories in listing order
+        stack.extend(reversed(subdirs))
+
+class JsonObjectTracker:
+    """Incremental brace matcher for finding JSON objects in model output
+    
+    feed() takes the text in pieces (e.g. streamed tokens) and returns each
+    top-level {...} object as soon as it closes. Brace depth and string
+    state are tracked, so nested objects and braces inside strings are
+    handled.
+    """
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.pending = []  # pieces of the object still open
+
+    def feed(self, text):
+        objects = []
+        depth, in_string, escaped = self.depth, self.in_string, self.escaped
+        start = 0
+        i = 0
+        n = len(text)
+        while i < n:
+            if depth == 0:
+                # outside any object: jump to the next opening brace
+                i = text.find('{', i)
+                if i == -1:
+                    break
+                start = i
+            ch = text[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == '\\':
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch == '{':
+                depth += 1
+            elif ch == '}':
+                depth -= 1
+                if depth == 0:
+                    self.pending.append(text[start:i + 1])
+                    objects.append(''.join(self.pending))
+                    self.pending = []
+            i += 1
+        if depth:
+            self.pending.append(text[start:])
+        self.depth, self.in_string, self.escaped = depth, in_string, escaped
+        return objects
+
+def iter_json_objects(text):
+    """Yield each top-level {...} substring of text, in order
+    
+    An unclosed object at the end is dropped.
+    """
+    yield from JsonObjectTracker().feed(text)
+
+class RequestPacer:
+    """Spaces request starts a fixed interval apart across all workers
+    
+    The interval limits the request rate instead of serializing the scans.
+    next_delay() reserves the next slot and returns how long the caller has
+    to wait for it; wait() also sleeps that long. Thread-safe.
+    """
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+    
+    def next_delay(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        return start - now
+    
+    def wait(self):
+        delay = self.next_delay()
+        if delay > 0:
+            time.sleep(delay)
+
+class JsonlWriter:
+    """Writes results to a JSON Lines file, one line each as they arrive
+    
+    The file is opened on the first result, so an empty scan leaves no
+    file behind; without output_file it gets a timestamped name in
+    OUTPUT_DIR. total and vuln_count count the results written.
+    """
+    def __init__(self, output_file=None):
+        self.output_file = output_file
+        self.total = 0
+        self.vuln_count = 0
+        self._f = None
+    
+    def write(self, result):
+        if self._f is None:
+            os.makedirs(OUTPUT_DIR, exist_ok=True)
+            if self.output_file is None:
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                self.output_file = os.path.join(OUTPUT_DIR, f'scan_results_{timestamp}.jsonl')
+            self._f = open(self.output_file, 'wb', buffering=1 << 20)
+        if orjson is not None:
+            self._f.write(orjson.dumps(result, default=str))
+        else:
+            self._f.write(json.dumps(result, ensure_ascii=False).encode('utf-8'))
+        self._f.write(b'\n')
+        self.total += 1
+        if result.get('success') and result.get('analysis', {}).get('has_vulnerability', False):
+            self.vuln_count += 1
+    
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+
 class VulnerabilityScanner:
     # initialize scanner
-    def __init__(self):
+    def __init__(self, workers=4, warm_up=True):
         self.api_url = OLLAMA_API_URL
         self.model_name = MODEL_NAME
+        # request body up to the code, and after it (see _build_payload)
+        self._payload_head = (b'{"model":"' + json_fragment(self.model_name)
+                              + b'","prompt":"' + _PROMPT_PREFIX_JSON)
+        self._payload_tail = (_PROMPT_SUFFIX_JSON + b'","stream":true,"temperature":0.1,'
+                              + b'"keep_alive":' + json.dumps(KEEP_ALIVE).encode('ascii') + b'}')
+        self.workers = workers
         self.scan_count = 0
         self.success_count = 0
         self.fail_count = 0
+        self.skipped_count = 0
+        # counters and request pacing are shared by the worker threads
+        self._lock = threading.Lock()
+        self.pacer = RequestPacer(DELAY_BETWEEN_FILES)
+        # one keep-alive session so every request reuses a pooled connection
+        # to the Ollama server instead of opening a new socket per file
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=16, pool_maxsize=16))
+        if warm_up:
+            self.warm_up()
+    
+    def warm_up(self):
+        # load the model once up front (an empty prompt only loads it), so
+        # the first scans don't each wait for it; keep_alive keeps it resident
+        try:
+            response = self.session.post(
+                self.api_url,
+                json={"model": self.model_name, "prompt": "", "keep_alive": KEEP_ALIVE},
+                timeout=MODEL_LOAD_TIMEOUT
+            )
+            response.raise_for_status()
+        except Exception as e:
+            print(f"Warning: could not preload model {self.model_name}: {e}")
     
     def read_file(self, file_path):
-        # read file content with multiple encoding attempts
-        encodings = ['utf-8', 'gbk']
-        
-        for encoding in encodings:
+        # read the file once, then try the common encodings on the bytes;
+        # latin-1 never fails, so there is always some text for the prompt.
+        # returns (text, line_count); line_count is None unless
+        # RECORD_LINE_COUNT is set
+        try:
+            with open(file_path, 'rb') as f:
+                raw = f.read()
+        except Exception as e:
+            raise Exception(f"Cannot read file: {e}")
+
+        line_count = raw.count(b'\n') + 1 if RECORD_LINE_COUNT else None
+        for encoding in ('utf-8', 'gbk'):
             try:
-                with open(file_path, 'r', encoding=encoding) as f:
-                    return f.read()
+                return raw.decode(encoding), line_count
             except UnicodeDecodeError:
                 continue
-            except Exception as e:
-                raise Exception(f"Cannot read file: {e}")
+        return raw.decode('latin-1'), line_count
+
+    def load_json_object(self, json_str):
+        # decode one candidate {...}; None unless it is a JSON object (the
+        # braces may also come from C code quoted in the answer)
+        try:
+            data = orjson.loads(json_str) if orjson is not None else json.loads(json_str)
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
 
-        raise Exception("Cannot read file with common encodings")
+    def parse_json_object(self, json_str):
+        # turn one candidate {...} into the analysis dict, None if unusable
+        if '"has_vulnerability"' not in json_str:
+            return None
+        data = self.load_json_object(json_str)
+        if data is None:
+            return None
+        return self.analysis_from(data)
+
+    def analysis_from(self, data):
+        # the analysis dict for one decoded object, None without has_vulnerability
+        data = find_analysis(data)
+        if data is None:
+            return None
+        return {
+            'parsed': True,
+            'has_vulnerability': data.get('has_vulnerability', False),
+            'vulnerability_type': data.get('vulnerability_type', 'unknown'),
+            'line_numbers': data.get('line_numbers', []),
+            'severity': data.get('severity', 'unknown'),
+            'description': data.get('description', ''),
+            'confidence': data.get('confidence', 0)
+        }
+
+    def read_stream(self, response):
+        """Collect a streamed /api/generate response
+        
+        Tokens are fed to a JsonObjectTracker as they arrive, and the
+        connection is closed as soon as the first complete JSON object has
+        been seen, so the model does not have to finish any trailing
+        commentary. Returns (model_response, analysis); analysis is None if
+        that object has no has_vulnerability, or if no object was found
+        before the stream ended. The caller then falls back to
+        parse_llm_response on the text received so far.
+        """
+        tracker = JsonObjectTracker()
+        pieces = []
+        analysis = None
+        try:
+            for line in response.iter_lines():
+                analysis, done = self._feed_line(line, tracker, pieces)
+                if done:
+                    break
+        finally:
+            response.close()
+        return ''.join(pieces), analysis
+
+    def _feed_line(self, line, tracker, pieces):
+        # handle one line of a streamed response; returns (analysis, done),
+        # done once the first JSON object closed or the model finished
+        if not line:
+            return None, False
+        chunk = orjson.loads(line) if orjson is not None else json.loads(line)
+        if 'error' in chunk:
+            raise Exception(chunk['error'])
+        token = chunk.get('response', '')
+        pieces.append(token)
+        for json_str in tracker.feed(token):
+            data = self.load_json_object(json_str)
+            if data is not None:
+                return self.analysis_from(data), True
+        return None, bool(chunk.get('done'))
 
     def parse_llm_response(self, response_text):
         # parse LLM response to extract vulnerability info
         try:
-            # Try to extract JSON part from the response
-            json_match = re.search(r'\{[^{}]*"has_vulnerability"[^{}]*\}', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                data = json.loads(json_str)
-                return {
-                    'parsed': True,
-                    'has_vulnerability': data.get('has_vulnerability', False),
-                    'vulnerability_type': data.get('vulnerability_type', 'unknown'),
-                    'line_numbers': data.get('line_numbers', []),
-                    'severity': data.get('severity', 'unknown'),
-                    'description': data.get('description', ''),
-                    'confidence': data.get('confidence', 0)
-                }
+            # Try to extract JSON part from the response: the first object
+            # that parses and carries has_vulnerability
+            for json_str in iter_json_objects(response_text):
+                analysis = self.parse_json_object(json_str)
+                if analysis is not None:
+                    return analysis
         except Exception as e:
             pass
         
         # If JSON parsing fails, use keyword detection
-        response_lower = response_text.lower()
-        keywords = ['buffer overflow', 'vulnerable', 'vulnerability', 'overflow', 'gets(']
-        has_vuln = any(keyword in response_lower for keyword in keywords)
+        has_vuln = _KEYWORD_RE.search(response_text) is not None
         
         return {
             'parsed': False,
             'has_vulnerability': has_vuln,
-            'raw_response': response_text[:500],  # only keep first 500 chars
             'note': 'Failed to parse JSON, used keyword detection'
         }
     
-    def scan_single_file(self, file_path):
-        # scan a single file for vulnerabilities
-        self.scan_count += 1
+    def _start_result(self, file_path):
+        # numbered result record for one file, marked failed until done
+        with self._lock:
+            self.scan_count += 1
+            scan_number = self.scan_count
         
-        result = {
+        return {
             'file': str(file_path),
-            'file_name': Path(file_path).name,
-            'scan_number': self.scan_count,
-            'timestamp': datetime.now().isoformat(),
+            # file_path is normally already a Path (from the directory walk)
+            'file_name': file_path.name if isinstance(file_path, Path) else os.path.basename(file_path),
+            'scan_number': scan_number,
+            'timestamp': time.time(),
             'success': False
         }
+    
+    def _build_payload(self, file_path, result):
+        # read code
+        code_content, line_count = self.read_file(file_path)
+        result['file_size'] = len(code_content)
+        if line_count is not None:
+            result['line_count'] = line_count
+
+        # keep prompt size (and model latency) bounded on huge files
+        if len(code_content) > MAX_CODE_CHARS:
+            code_content = truncate_code(code_content, MAX_CODE_CHARS)
+            result['truncated'] = True
+        
+        # construct the JSON request body: only the code is escaped per
+        # file, the prompt text and the other fields are pre-encoded bytes
+        # (model, PROMPT_PREFIX + code + PROMPT_SUFFIX, stream, temperature,
+        # keep_alive)
+        return self._payload_head + json_fragment(code_content) + self._payload_tail
+    
+    def _record_response(self, result, model_response, parsed_result):
+        # no usable JSON in the full response, fall back to keywords
+        if parsed_result is None:
+            parsed_result = self.parse_llm_response(model_response)
+        
+        result.update({
+            'success': True,
+            'model_response': model_response,
+            'analysis': parsed_result
+        })
+    
+    def _finish_result(self, result):
+        with self._lock:
+            if result['success']:
+                self.success_count += 1
+            else:
+                self.fail_count += 1
+        return result
+    
+    def scan_single_file(self, file_path):
+        # scan a single file for vulnerabilities
+        result = self._start_result(file_path)
         
         try:
-            # read code
-            code_content = self.read_file(file_path)
-            result['file_size'] = len(code_content)
-            result['line_count'] = code_content.count('\n') + 1
-            
-            # construct prompt
-            prompt = VULNERABILITY_PROMPT.replace("{code_content}", code_content)
-
+            payload = self._build_payload(file_path, result)
 
             # call API
-            payload = {
-                "model": self.model_name,
-                "prompt": prompt,
-                "stream": False,
-                "temperature": 0.1
-            }
-            
-            response = requests.post(
+            self.pacer.wait()
+            response = self.session.post(
                 self.api_url, 
-                json=payload, 
-                timeout=REQUEST_TIMEOUT
+                data=payload,
+                headers=JSON_HEADERS,
+                timeout=REQUEST_TIMEOUT,
+                stream=True
             )
             response.raise_for_status()
             
-            # parse response
-            llm_result = response.json()
-            model_response = llm_result['response']
-
-            # parse LLM response
-            parsed_result = self.parse_llm_response(model_response)
-            
-            result.update({
-                'success': True,
-                'model_response': model_response,
-                'analysis': parsed_result
-            })
-            
-            self.success_count += 1
+            # read tokens until the JSON answer is complete
+            model_response, parsed_result = self.read_stream(response)
+            self._record_response(result, model_response, parsed_result)
             
         except requests.exceptions.Timeout:
             result['error'] = 'API request timed out'
-            self.fail_count += 1
         except requests.exceptions.ConnectionError:
             result['error'] = 'Failed to connect to Ollama'
-            self.fail_count += 1
         except Exception as e:
             result['error'] = str(e)
-            self.fail_count += 1
         
-        return result
+        return self._finish_result(result)
     
-    def scan_directory(self, directory, pattern='*.c', max_files=None):
+    def scan_directory(self, directory, pattern='*.c', max_files=None, resume=True):
         """scan all files in a directory matching the pattern
         
         Args:
             directory: the directory path to scan
             pattern: file matching pattern
             max_files: maximum number of files to scan (for test mode)
+            resume: skip files already scanned successfully by an earlier
+                full run (recorded in SCANNED_INDEX) with the same model and
+                prompt, if unchanged since; test mode (max_files) runs are
+                not recorded, so a later full run covers every file
         """
+        return list(self.iter_scan(directory, pattern, max_files, resume))
+    
+    def iter_scan(self, directory, pattern='*.c', max_files=None, resume=True):
+        """Same as scan_directory, but yields each result as soon as it is done"""
+        self._print_scan_start(directory, pattern, max_files)
+        
+        # requests spend nearly all their time waiting on the model server,
+        # so several files are scanned at once; files are found while the
+        # first ones are scanned, keeping at most a few per worker queued
+        window = self.workers * 2
+        pending = {}
+        count = 0
+        with open(SCANNED_INDEX, 'a', encoding='utf-8') as index, \
+                ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for file_path, key in self._iter_new_files(directory, pattern, max_files, resume):
+                pending[executor.submit(self.scan_single_file, file_path)] = (file_path, key)
+                if len(pending) < window:
+                    continue
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    count += 1
+                    file_path, key = pending.pop(future)
+                    yield self._report(count, max_files, file_path, future.result(), index, key)
+            for future in as_completed(pending):
+                count += 1
+                file_path, key = pending[future]
+                yield self._report(count, max_files, file_path, future.result(), index, key)
+
+        self._print_scan_end(directory, pattern, count)
+    
+    def _print_scan_start(self, directory, pattern, max_files):
         # Find all files matching the pattern
-        directory_path = Path(directory)
-        if not directory_path.exists():
+        if not os.path.isdir(directory):
             raise FileNotFoundError(f"Directory does not exist: {directory}")
 
-        all_files = list(directory_path.rglob(pattern))
-        
-        if not all_files:
-            print(f"Warning: No {pattern} files found in {directory}")
-            return []
-        
-        # if set max_files, limit the number of files to scan
-        if max_files and max_files < len(all_files):
-            files = all_files[:max_files]
-            print(f"\nFound {len(all_files)} files, test mode will scan the first {max_files} files")
+        if max_files:
+            print(f"\nTest mode will scan the first {max_files} {pattern} files")
         else:
-            files = all_files
-            print(f"\nFound {len(files)} files to scan")
-
+            print(f"\nScanning {pattern} files")
         print("=" * 60)
-        
-        results = []
-        
-        for i, file_path in enumerate(files, 1):
-            print(f"\n[{i}/{len(files)}] Scanning: {file_path.name}")
-            print(f"  Path: {file_path}")
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+    
+    def _iter_new_files(self, directory, pattern, max_files, resume):
+        # (file_path, index key) for each file still to scan, at most
+        # max_files of them; files in the resume index are counted in
+        # self.skipped_count instead
+        scanned = load_scanned_index() if resume else set()
+        self.skipped_count = 0
+        submitted = 0
+        for file_path in iter_files(directory, pattern):
+            if max_files and submitted >= max_files:
+                return
+            key = scanned_key(file_path)
+            if key in scanned:
+                self.skipped_count += 1
+                continue
+            submitted += 1
+            yield file_path, key
+    
+    def _print_scan_end(self, directory, pattern, count):
+        if self.skipped_count:
+            print(f"\nSkipped {self.skipped_count} files already scanned (use --rescan to scan them again)")
+            if count:
+                print("Note: the results of this run only cover the files scanned in it, "
+                      "the skipped files are in the results of earlier runs")
+                print("      (pass all of them to analyze_results.py to analyze the whole scan)")
+        elif not count:
+            print(f"Warning: No {pattern} files found in {directory}")
+    
+    def _report(self, i, max_files, file_path, result, index, key):
+        # print progress for one finished file, record it in the resume
+        # index if it succeeded (not in test mode), then hand the result back
+        if result['success'] and not max_files:
+            index.write(key + '\n')
+            index.flush()
 
-            # Scan file
-            result = self.scan_single_file(file_path)
-            results.append(result)
+        progress = f"{i}/{max_files}" if max_files else f"{i}"
+        print(f"\n[{progress}] Scanned: {file_path.name}")
+        print(f"  Path: {file_path}")
 
-            # Show results
-            if result['success']:
-                analysis = result['analysis']
-                has_vuln = analysis.get('has_vulnerability', False)
-                status = "Vulnerability found" if has_vuln else "No vulnerability found"
-                print(f"  Status: {status}")
-                
-                if has_vuln and 'description' in analysis:
-                    print(f"  Description: {analysis['description'][:80]}")
-            else:
-                print(f" !Error: {result.get('error', 'Unknown error')}")
+        # Show results
+        if result['success']:
+            analysis = result['analysis']
+            has_vuln = analysis.get('has_vulnerability', False)
+            status = "Vulnerability found" if has_vuln else "No vulnerability found"
+            print(f"  Status: {status}")
+            
+            if has_vuln and 'description' in analysis:
+                print(f"  Description: {analysis['description'][:80]}")
+        else:
+            print(f" !Error: {result.get('error', 'Unknown error')}")
 
-            # Delay between files
-            if i < len(files):
-                time.sleep(DELAY_BETWEEN_FILES)
-        
-        return results
+        return result
     
     def save_results(self, results, output_file=None):
         """Save scan results to a JSON file"""
@@ -201,21 +576,49 @@ class VulnerabilityScanner:
             output_file = os.path.join(OUTPUT_DIR, f'scan_results_{timestamp}.json')
 
         # Save JSON file
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
+        if orjson is not None:
+            with open(output_file, 'wb') as f:
+                f.write(orjson.dumps(results, default=str, option=orjson.OPT_INDENT_2))
+        else:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, ensure_ascii=False)
+        
+        # Count vulnerabilities
+        vuln_count = sum(1 for r in results
+                        if r.get('success') and 
+                        r.get('analysis', {}).get('has_vulnerability', False))
+        self._print_saved(len(results), vuln_count, output_file)
+
+        return output_file
+    
+    def save_results_jsonl(self, results, output_file=None):
+        """Write results to a JSON Lines file as they arrive
         
+        results may be any iterable, e.g. iter_scan(), so nothing beyond the
+        current result is kept in memory. Returns the output file, or None
+        if there were no results (no file is created then).
+        """
+        writer = JsonlWriter(output_file)
+        try:
+            for result in results:
+                writer.write(result)
+        finally:
+            writer.close()
+        return self._jsonl_saved(writer)
+    
+    def _jsonl_saved(self, writer):
+        # print the summary for a finished JsonlWriter, return its file
+        if not writer.total:
+            return None
+        self._print_saved(writer.total, writer.vuln_count, writer.output_file)
+        return writer.output_file
+    
+    def _print_saved(self, total, vuln_count, output_file):
         print("\n" + "=" * 60)
         print("Scan complete!")
         print("=" * 60)
-        print(f"Total files scanned: {len(results)}")
+        print(f"Total files scanned: {total}")
         print(f"Success: {self.success_count}")
         print(f"Failed: {self.fail_count}")
         print(f"Results saved to: {output_file}")
-
-        # Count vulnerabilities
-        vuln_count = sum(1 for r in results
-                        if r.get('success') and 
-                        r.get('analysis', {}).get('has_vulnerability', False))
         print(f"Vulnerable files detected: {vuln_count}")
-
-        return output_file
@@ -0,0 +1,97 @@
+# scanner_async.py
+# usage: asyncio/httpx variant of the Ollama scanner, many requests on one event loop
+
+import asyncio
+import httpx
+from scanner import VulnerabilityScanner, JsonObjectTracker, JsonlWriter, SCANNED_INDEX, JSON_HEADERS
+from config import REQUEST_TIMEOUT
+
+class AsyncVulnerabilityScanner(VulnerabilityScanner):
+    """Same scan as VulnerabilityScanner, with requests issued from a single
+    event loop instead of a thread per in-flight file
+
+    scan_directory and iter_scan are coroutines here; everything else
+    (prompt, parsing, resume index, output) is shared with the sync scanner.
+    """
+    async def _wait_turn_async(self):
+        delay = self.pacer.next_delay()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def read_stream_async(self, response):
+        """Async read_stream: returns (model_response, analysis)"""
+        tracker = JsonObjectTracker()
+        pieces = []
+        analysis = None
+        async for line in response.aiter_lines():
+            analysis, done = self._feed_line(line, tracker, pieces)
+            if done:
+                break
+        return ''.join(pieces), analysis
+
+    async def scan_single_file_async(self, client, file_path):
+        # scan a single file for vulnerabilities
+        result = self._start_result(file_path)
+
+        try:
+            payload = self._build_payload(file_path, result)
+
+            # call API; leaving the stream block early closes the response
+            await self._wait_turn_async()
+            async with client.stream('POST', self.api_url, content=payload,
+                                     headers=JSON_HEADERS) as response:
+                response.raise_for_status()
+                model_response, parsed_result = await self.read_stream_async(response)
+            self._record_response(result, model_response, parsed_result)
+
+        except httpx.TimeoutException:
+            result['error'] = 'API request timed out'
+        except httpx.ConnectError:
+            result['error'] = 'Failed to connect to Ollama'
+        except Exception as e:
+            result['error'] = str(e)
+
+        return self._finish_result(result)
+
+    async def scan_directory(self, directory, pattern='*.c', max_files=None, resume=True):
+        """Async scan_directory: returns the list of results"""
+        return [result async for result in self.iter_scan(directory, pattern, max_files, resume)]
+
+    async def save_results_jsonl_async(self, results, output_file=None):
+        """Async save_results_jsonl: results is an async iterator such as
+        iter_scan(), each result is written as soon as it arrives"""
+        writer = JsonlWriter(output_file)
+        try:
+            async for result in results:
+                writer.write(result)
+        finally:
+            writer.close()
+        return self._jsonl_saved(writer)
+
+    async def iter_scan(self, directory, pattern='*.c', max_files=None, resume=True):
+        """Yield each result as soon as it is done, at most self.workers in flight"""
+        self._print_scan_start(directory, pattern, max_files)
+
+        limits = httpx.Limits(max_connections=self.workers, max_keepalive_connections=16)
+        pending = {}
+        count = 0
+        async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT, limits=limits) as client:
+            with open(SCANNED_INDEX, 'a', encoding='utf-8') as index:
+                for file_path, key in self._iter_new_files(directory, pattern, max_files, resume):
+                    task = asyncio.ensure_future(self.scan_single_file_async(client, file_path))
+                    pending[task] = (file_path, key)
+                    if len(pending) < self.workers:
+                        continue
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        count += 1
+                        file_path, key = pending.pop(task)
+                        yield self._report(count, max_files, file_path, task.result(), index, key)
+                while pending:
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        count += 1
+                        file_path, key = pending.pop(task)
+                        yield self._report(count, max_files, file_path, task.result(), index, key)
+
+        self._print_scan_end(directory, pattern, count)
@@ -6,21 +6,34 @@ import os
 from pathlib import Path
 from datetime import datetime
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# optional; parses the JSON in replies and writes the results file
+try:
+    import orjson
+except ImportError:
+    orjson = None
 from openai import OpenAI
-from config import DELAY_BETWEEN_FILES, OUTPUT_DIR
+from scanner import KEYWORD_RE, RequestPacer, iter_json_objects, truncate_code
+from config import DELAY_BETWEEN_FILES, OUTPUT_DIR, RECORD_LINE_COUNT
 
 class VulnerabilityScannerOpenAI:
-    def __init__(self, api_key, model="gpt-4o-mini"):
+    def __init__(self, api_key, model="gpt-4o-mini", workers=4):
         """
         Args:
             api_key: OpenAI API key
             model: Model name (gpt-4o-mini is fast and cheap, gpt-4 is more accurate)
+            workers: Number of files scanned concurrently
         """
         self.client = OpenAI(api_key=api_key)
         self.model = model
+        self.workers = workers
         self.scan_count = 0
         self.success_count = 0
         self.fail_count = 0
+        self._lock = threading.Lock()
+        self.pacer = RequestPacer(DELAY_BETWEEN_FILES)
         
         # Simple prompt optimized for speed
         self.prompt_template = """Analyze this C/C++ code for buffer overflow vulnerabilities.
@@ -39,24 +52,31 @@ Respond in JSON format:
 }}"""
     
     def read_file(self, file_path):
-        """Read file with encoding fallback"""
-        for encoding in ['utf-8', 'gbk', 'latin-1']:
+        """Read file once, then decode with encoding fallback
+        
+        Returns (text, line_count); line_count is None unless RECORD_LINE_COUNT
+        """
+        with open(file_path, 'rb') as f:
+            raw = f.read()
+        line_count = raw.count(b'\n') + 1 if RECORD_LINE_COUNT else None
+        for encoding in ('utf-8', 'gbk'):
             try:
-                with open(file_path, 'r', encoding=encoding) as f:
-                    return f.read()
+                return raw.decode(encoding), line_count
             except UnicodeDecodeError:
                 continue
-        raise Exception("Cannot read file with common encodings")
+        return raw.decode('latin-1'), line_count  # never fails
     
     def parse_response(self, response_text):
         """Parse JSON response from LLM"""
         try:
-            # Try to extract JSON
-            start = response_text.find('{')
-            end = response_text.rfind('}') + 1
-            if start != -1 and end > start:
-                json_str = response_text[start:end]
-                data = json.loads(json_str)
+            # Try to extract JSON: first complete object that parses
+            for json_str in iter_json_objects(response_text):
+                try:
+                    data = orjson.loads(json_str) if orjson is not None else json.loads(json_str)
+                except ValueError:
+                    continue
+                if not isinstance(data, dict):
+                    continue
                 return {
                     'parsed': True,
                     'has_vulnerability': data.get('has_vulnerability', False),
@@ -70,40 +90,41 @@ Respond in JSON format:
             pass
         
         # Fallback: keyword detection
-        response_lower = response_text.lower()
-        has_vuln = any(kw in response_lower for kw in 
-                      ['buffer overflow', 'vulnerable', 'overflow'])
+        has_vuln = KEYWORD_RE.search(response_text) is not None
         return {
             'parsed': False,
-            'has_vulnerability': has_vuln,
-            'raw_response': response_text[:500]
+            'has_vulnerability': has_vuln
         }
     
     def scan_single_file(self, file_path):
         """Scan a single file"""
-        self.scan_count += 1
+        with self._lock:
+            self.scan_count += 1
+            scan_number = self.scan_count
         result = {
             'file': str(file_path),
-            'file_name': Path(file_path).name,
-            'scan_number': self.scan_count,
-            'timestamp': datetime.now().isoformat(),
+            'file_name': file_path.name if isinstance(file_path, Path) else os.path.basename(file_path),
+            'scan_number': scan_number,
+            'timestamp': time.time(),
             'success': False,
             'api_used': f'OpenAI {self.model}'
         }
         
         try:
-            code = self.read_file(file_path)
+            code, line_count = self.read_file(file_path)
             result['file_size'] = len(code)
-            result['line_count'] = code.count('\n') + 1
+            if line_count is not None:
+                result['line_count'] = line_count
             
             # Limit code length (GPT has token limits)
             if len(code) > 8000:
-                code = code[:8000]
+                code = truncate_code(code, 8000)
                 result['note'] = 'Code truncated to 8000 chars'
             
             prompt = self.prompt_template.replace('{code_content}', code)
             
             # Call OpenAI API
+            self.pacer.wait()
             response = self.client.chat.completions.create(
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
@@ -120,11 +141,15 @@ Respond in JSON format:
                 'analysis': parsed,
                 'tokens_used': response.usage.total_tokens
             })
-            self.success_count += 1
             
         except Exception as e:
             result['error'] = str(e)
-            self.fail_count += 1
+        
+        with self._lock:
+            if result['success']:
+                self.success_count += 1
+            else:
+                self.fail_count += 1
         
         return result
     
@@ -149,20 +174,21 @@ Respond in JSON format:
         print("=" * 60)
         results = []
         
-        for i, file_path in enumerate(files, 1):
-            print(f"\n[{i}/{len(files)}] Scanning: {file_path.name}")
-            result = self.scan_single_file(file_path)
-            results.append(result)
-            
-            if result['success']:
-                vuln = result['analysis'].get('has_vulnerability', False)
-                status = "⚠ Vulnerability found" if vuln else "✓ Clean"
-                print(f"  Status: {status}")
-            else:
-                print(f"  ✗ Error: {result.get('error', 'Unknown')}")
-            
-            if i < len(files):
-                time.sleep(DELAY_BETWEEN_FILES)
+        # Requests are network-bound, so scan several files at once
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self.scan_single_file, fp): fp for fp in files}
+            for i, future in enumerate(as_completed(futures), 1):
+                file_path = futures[future]
+                result = future.result()
+                results.append(result)
+                print(f"\n[{i}/{len(files)}] Scanned: {file_path.name}")
+                
+                if result['success']:
+                    vuln = result['analysis'].get('has_vulnerability', False)
+                    status = "⚠ Vulnerability found" if vuln else "✓ Clean"
+                    print(f"  Status: {status}")
+                else:
+                    print(f"  ✗ Error: {result.get('error', 'Unknown')}")
         
         return results
     
@@ -174,8 +200,12 @@ Respond in JSON format:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             output_file = os.path.join(OUTPUT_DIR, f'scan_results_openai_{timestamp}.json')
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
+        if orjson is not None:
+            with open(output_file, 'wb') as f:
+                f.write(orjson.dumps(results, default=str, option=orjson.OPT_INDENT_2))
+        else:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, ensure_ascii=False)
         
         print("\n" + "=" * 60)
         print("Scan complete!")
@@ -1,121 +1,316 @@
 # test_api.py
 # usage: Test Ollama API connectivity and model functionality, run this before batch scanning
 
-import requests
+import asyncio
+import hashlib
+import os
+import re
+import time
+import httpx
 import json
-from config import OLLAMA_API_URL, MODEL_NAME
+from config import OLLAMA_API_URL, MODEL_NAME, OUTPUT_DIR, MODEL_LOAD_TIMEOUT
 
-def test_connection():
+# optional; encodes the test requests and decodes the replies and cache
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+TEST_KEEP_ALIVE = "10m"  # keep the model loaded a while after the tests
+# end the yes/no answer at the first break; test 3 only checks that the call works
+TEST_STOP = ["\n\n", "```"]
+# connecting to a local server is immediate, so a refused or hanging
+# connection is reported after a second instead of after the read timeout
+CONNECT_TIMEOUT = 1.0
+# test inputs; the prompts are built once, so they also stay identical for
+# the response cache
+_TEST_CODE = """
+char buffer[10];
+gets(buffer);
+"""
+
+# sample vulnerable C code, can be replaced with any known vulnerable snippet
+_VULN_CODE = """
+#include <stdio.h>
+#include <string.h>
+
+void vulnerable_function(char *input) {
+    char buffer[10];
+    strcpy(buffer, input); 
+    printf("%s\\n", buffer);
+}
+
+int main() {
+    char large_input[100];
+    gets(large_input);
+    vulnerable_function(large_input);
+    return 0;
+}
+"""
+
+_SIMPLE_PROMPT = f"Is there a buffer overflow in this code?\n{_TEST_CODE}\nAnswer yes or no."
+# can customize prompt as needed
+_VULN_PROMPT = f"Analyze this C code for buffer overflow vulnerabilities:\n{_VULN_CODE}"
+
+# answer counts as a detection if it mentions any of these
+_VULN_RE = re.compile(r'buffer overflow|vulnerable|overflow', re.IGNORECASE)
+
+def _loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def _dumps(obj):
+    return orjson.dumps(obj) if orjson is not None else json.dumps(obj).encode('utf-8')
+
+# opt-in cache of the generate responses, so repeated runs can skip the
+# model; set OLLAMA_TEST_USE_CACHE=1 to use it
+USE_CACHE = os.environ.get('OLLAMA_TEST_USE_CACHE') == '1'
+CACHE_FILE = os.path.join(OUTPUT_DIR, 'llm_test_cache.json')
+CACHE_TTL = 7 * 24 * 3600  # seconds a cached response stays valid
+
+def _cache_key(prompt):
+    return hashlib.sha256((MODEL_NAME + "|" + prompt).encode('utf-8')).hexdigest()
+
+def _load_cache():
+    try:
+        with open(CACHE_FILE, 'rb') as f:
+            return _loads(f.read())
+    except (OSError, ValueError):
+        return {}
+
+def _save_cache(cache):
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    with open(CACHE_FILE, 'wb') as f:
+        f.write(_dumps(cache))
+
+_warmup_task = None
+# generate requests allowed at once; Ollama queues parallel generate requests,
+# so more than one only lets the queued ones run into their timeout
+MAX_PARALLEL = int(os.environ.get('OLLAMA_MAX_PARALLEL', '1'))
+_generate_sem = None  # asyncio.BoundedSemaphore(MAX_PARALLEL), set per run
+
+async def _warm_up(client):
+    # an empty prompt only loads the model; errors are left to the tests
+    try:
+        await client.post(OLLAMA_API_URL, content=_dumps({
+            "model": MODEL_NAME,
+            "prompt": "",
+            "stream": False,
+            "keep_alive": TEST_KEEP_ALIVE,
+            "options": {"num_predict": 1}
+        }), headers=JSON_HEADERS, timeout=httpx.Timeout(MODEL_LOAD_TIMEOUT, connect=CONNECT_TIMEOUT))
+    except Exception:
+        pass
+
+def warm_up(client):
+    # awaitable shared model load, started once per test run
+    global _warmup_task
+    if _warmup_task is None:
+        _warmup_task = asyncio.ensure_future(_warm_up(client))
+    return _warmup_task
+
+async def generate(client, payload, timeout, until=None):
+    # POST payload to /api/generate and return the parsed result; with
+    # USE_CACHE, a fresh cached response for the same prompt is returned
+    # (marked with 'cached') instead of calling the model. A streaming
+    # payload is read line by line and cut off as soon as the text so far
+    # matches the regex until
+    key = _cache_key(payload['prompt'])
+    if USE_CACHE:
+        entry = _load_cache().get(key)
+        if entry and time.time() - entry['ts'] < CACHE_TTL:
+            return {'response': entry['response'], 'cached': True}
+
+    # wait for the model to be loaded, so timeout only covers generation
+    await warm_up(client)
+    timeout = httpx.Timeout(timeout, connect=CONNECT_TIMEOUT)
+    async with _generate_sem:
+        if payload.get('stream'):
+            result = {'response': await _generate_stream(client, payload, timeout, until)}
+        else:
+            response = await client.post(OLLAMA_API_URL, content=_dumps(payload),
+                                         headers=JSON_HEADERS, timeout=timeout)
+            response.raise_for_status()
+            result = _loads(response.content)
+
+    if USE_CACHE:
+        cache = _load_cache()
+        cache[key] = {'response': result['response'], 'ts': time.time()}
+        _save_cache(cache)
+    return result
+
+async def _generate_stream(client, payload, timeout, until):
+    # leaving the stream block early closes the response, which stops Ollama
+    # generating the rest of the answer
+    text = ''
+    async with client.stream('POST', OLLAMA_API_URL, content=_dumps(payload),
+                             headers=JSON_HEADERS, timeout=timeout) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            chunk = _loads(line)
+            text += chunk.get('response', '')
+            if chunk.get('done') or (until is not None and until.search(text)):
+                break
+    return text
+
+# test_connection and test_model both need /api/tags; they share one request
+_tags_task = None
+
+async def _fetch_tags(client):
+    response = await client.get("http://localhost:11434/api/tags",
+                                timeout=httpx.Timeout(5, connect=CONNECT_TIMEOUT))
+    try:
+        data = _loads(response.content)
+    except ValueError:
+        data = None
+    return response.status_code, data
+
+def get_tags(client):
+    # awaitable (status_code, parsed body) of the one /api/tags request;
+    # a failed request is dropped so the next caller tries again
+    global _tags_task
+    if _tags_task is None:
+        _tags_task = asyncio.ensure_future(_fetch_tags(client))
+        _tags_task.add_done_callback(_forget_failed_tags)
+    return _tags_task
+
+def _forget_failed_tags(task):
+    global _tags_task
+    if task.cancelled() or task.exception() is not None:
+        _tags_task = None
+
+async def test_connection(client):
     # test 1: check Ollama connection
-    print("Test 1: Checking Ollama connection...")
+    # each test collects its lines and prints them in one go, so the output
+    # of the concurrently running tests does not interleave
+    lines = ["Test 1: Checking Ollama connection..."]
     try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
-        if response.status_code == 200:
-            print("Ollama is running")
-            return True
+        status_code, _ = await get_tags(client)
+        if status_code == 200:
+            lines.append("Ollama is running")
+            ok = True
         else:
-            print("Ollama response error")
-            return False
-    except requests.exceptions.ConnectionError:
-        print("Unable to connect to Ollama, please ensure 'ollama serve' is running")
-        return False
+            lines.append("Ollama response error")
+            ok = False
+    except httpx.ConnectError:
+        lines.append("Unable to connect to Ollama, please ensure 'ollama serve' is running")
+        ok = False
     except Exception as e:
-        print(f"Error: {e}")
-        return False
+        lines.append(f"Error: {e}")
+        ok = False
+    print("\n".join(lines))
+    return ok
 
-def test_model():
+async def test_model(client):
     # test 2: check if model is available
-    print(f"\nTest 2: Checking model {MODEL_NAME}...")
+    lines = [f"\nTest 2: Checking model {MODEL_NAME}..."]
     try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
-        data = response.json()
-        models = [model['name'] for model in data.get('models', [])]
+        status_code, data = await get_tags(client)
+        if data is None:
+            raise ValueError(f"unexpected /api/tags response (HTTP {status_code})")
+        models = {model['name'] for model in data.get('models', [])}
         
         if MODEL_NAME in models:
-            print(f"Model {MODEL_NAME} is installed")
-            return True
+            lines.append(f"Model {MODEL_NAME} is installed")
+            ok = True
         else:
-            print(f"Model {MODEL_NAME} not found")
-            print(f"Available models: {', '.join(models)}")
-            return False
+            lines.append(f"Model {MODEL_NAME} not found")
+            lines.append(f"Available models: {', '.join(sorted(models))}")
+            ok = False
     except Exception as e:
-        print(f"Error: {e}")
-        return False
+        lines.append(f"Error: {e}")
+        ok = False
+    print("\n".join(lines))
+    return ok
 
-def test_simple_query():
+async def test_simple_query(client):
     # test 3: simple query test
-    print("\nTest 3: Simple query test...")
-    
-    test_code = """
-char buffer[10];
-gets(buffer);
-"""
+    lines = ["\nTest 3: Simple query test..."]
     
     payload = {
         "model": MODEL_NAME,
-        "prompt": f"Is there a buffer overflow in this code?\n{test_code}\nAnswer yes or no.",
-        "stream": False
+        "prompt": _SIMPLE_PROMPT,
+        "stream": False,
+        "keep_alive": TEST_KEEP_ALIVE,
+        # only the start of the answer is shown, so stop generating early
+        "options": {"num_predict": 64, "temperature": 0, "stop": TEST_STOP}
     }
     
     try:
-        response = requests.post(OLLAMA_API_URL, json=payload, timeout=30)
-        response.raise_for_status()
-        result = response.json()
+        result = await generate(client, payload, timeout=30)
+        if result.get('cached'):
+            lines.append("(using cached response)")
         
-        print("API call successful.")
-        print(f"Model response: {result['response'][:200]}...")
-        return True
+        lines.append("API call successful.")
+        lines.append(f"Model response: {result['response'][:200]}...")
+        ok = True
     except Exception as e:
-        print(f"API call failed: {e}")
-        return False
+        lines.append(f"API call failed: {e}")
+        ok = False
+    print("\n".join(lines))
+    return ok
 
-def test_vulnerability_detection():
+async def test_vulnerability_detection(client):
     # test 4: check vulnerability detection
-    print("\nTest 4: Checking vulnerability detection...")
-    
-    # sample vulnerable C code, can be replaced with any known vulnerable snippet
-    vulnerable_code = """
-#include <stdio.h>
-#include <string.h>
-
-void vulnerable_function(char *input) {
-    char buffer[10];
-    strcpy(buffer, input); 
-    printf("%s\\n", buffer);
-}
-
-int main() {
-    char large_input[100];
-    gets(large_input);
-    vulnerable_function(large_input);
-    return 0;
-}
-"""
+    lines = ["\nTest 4: Checking vulnerability detection..."]
     
     payload = {
         "model": MODEL_NAME,
-        # can customize prompt as needed
-        "prompt": f"Analyze this C code for buffer overflow vulnerabilities:\n{vulnerable_code}",
-        "stream": False
+        "prompt": _VULN_PROMPT,
+        # streamed, so the answer can be cut off at the first keyword
+        "stream": True,
+        "keep_alive": TEST_KEEP_ALIVE,
+        # enough for the 300-char snippet and the keyword check; no stop
+        # sequences, the keyword often comes after an intro and a blank line
+        "options": {"num_predict": 128, "temperature": 0}
     }
     
     try:
-        response = requests.post(OLLAMA_API_URL, json=payload, timeout=90)
-        result = response.json()
-        response_text = result['response'].lower()
+        result = await generate(client, payload, timeout=90, until=_VULN_RE)
+        if result.get('cached'):
+            lines.append("(using cached response)")
 
         # Check if vulnerability is detected
-        if any(keyword in response_text for keyword in ['buffer overflow', 'vulnerable', 'overflow']):
-            print("Model successfully detected vulnerability")
-            print(f"Model response snippet: {result['response'][:300]}...")
-            return True
+        if _VULN_RE.search(result['response']):
+            lines.append("Model successfully detected vulnerability")
+            lines.append(f"Model response snippet: {result['response'][:300]}...")
+            ok = True
         else:
-            print("Model did not explicitly identify vulnerability")
-            print(f"Model response: {result['response']}")
-            return False
+            lines.append("Model did not explicitly identify vulnerability")
+            lines.append(f"Model response: {result['response']}")
+            ok = False
     except Exception as e:
-        print(f"Test failed: {e}")
-        return False
+        lines.append(f"Test failed: {e}")
+        ok = False
+    print("\n".join(lines))
+    return ok
+
+async def _run_tests(tests):
+    # the tests only wait on the Ollama server, so run them all at once;
+    # gather keeps the results in test order. tests[0] is the connection
+    # check: if it fails, the others are cancelled and count as failed
+    # instead of each waiting out its timeout
+    global _tags_task, _warmup_task, _generate_sem
+    _tags_task = None
+    _warmup_task = None
+    _generate_sem = asyncio.BoundedSemaphore(MAX_PARALLEL)
+    # one keep-alive connection per concurrent test, reused by every request
+    limits = httpx.Limits(max_connections=len(tests), max_keepalive_connections=len(tests),
+                          keepalive_expiry=30)
+    client = httpx.AsyncClient(limits=limits)
+    try:
+        tasks = [asyncio.ensure_future(test(client)) for test in tests]
+        if not await tasks[0]:
+            for task in tasks[1:]:
+                task.cancel()
+            await asyncio.gather(*tasks[1:], return_exceptions=True)
+            print("\nOllama is not reachable, skipping the remaining tests")
+            return [False] * len(tasks)
+        return await asyncio.gather(*tasks)
+    finally:
+        await client.aclose()
 
 def run_all_tests():
     """Run all tests"""
@@ -130,9 +325,7 @@ def run_all_tests():
         test_vulnerability_detection
     ]
     
-    results = []
-    for test in tests:
-        results.append(test())
+    results = asyncio.run(_run_tests(tests))
     
     print("\n" + "=" * 60)
     print(f"Test results: {sum(results)}/{len(results)} passed")